@@ -17,7 +17,9 @@ class Config:
         'PATHS': {
             'local_media_path': './Peliculas/',
             'iptv_folder_path': './Archivos M3U/',
-            'radio_file_path': 'radios.json'
+            'radio_file_path': 'radios.json',
+            'library_db_path': 'media_library.db',
+            'thumbnail_cache_path': 'thumbnails'
         },
         'VPN': {
             'enabled_for_iptv': 'no',
@@ -26,10 +28,15 @@ class Config:
             'password': ''
         },
         'IPTV': {
-            'source_url': ''
+            'source_url': '',
+            'refresh_interval_hours': '0',
+            'last_refresh': ''
         },
         'TMDB': {
             'api_key': ''
+        },
+        'PLAYER': {
+            'hwdec': 'auto'
         }
     }
 
@@ -1,95 +1,750 @@
 # app/core/iptv.py
 
 import os
+import gzip
+import hashlib
+import itertools
 import logging
+import lzma
+import marshal
+import mmap
+import multiprocessing
 import re
+import struct
+import time
+import unicodedata
+from array import array
 from collections import namedtuple
-from typing import List
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, Iterator, List, Optional
+from urllib.parse import urlsplit, urlunsplit
 
 from app.core.config import config
 
-# Estructura para los canales
-Channel = namedtuple('Channel', ['name', 'logo', 'url', 'group'])
+# Estructura para los canales. Los atributos tvg-* extra son opcionales.
+Channel = namedtuple(
+    'Channel',
+    ['name', 'logo', 'url', 'group', 'tvg_id', 'tvg_name', 'tvg_chno', 'catchup'],
+    defaults=('', '', '', '')
+)
+
+# Atributo de #EXTINF -> campo de Channel
+_ATTR_FIELDS = {
+    'tvg-logo': 'logo',
+    'group-title': 'group',
+    'tvg-id': 'tvg_id',
+    'tvg-name': 'tvg_name',
+    'tvg-chno': 'tvg_chno',
+    'catchup': 'catchup',
+}
 
 # Compilar expresiones regulares una sola vez (optimización)
-_RE_LOGO = re.compile(r'tvg-logo="([^"]*)"')
-_RE_GROUP = re.compile(r'group-title="([^"]*)"')
+# Cabecera #EXTINF: metadatos (sin comas fuera de comillas) y nombre tras la coma
+_RE_EXTINF = re.compile(r'#EXTINF:([^,"]*(?:"[^"]*"[^,"]*)*),(.*)')
+# Pares clave="valor" de los metadatos. Van precedidos de un espacio o, en
+# listas mal formadas, pegados a las comillas del anterior (tvg-name="x"group-title="y")
+_RE_ATTR = re.compile(r'(?<![^\s"])([\w-]+)="([^"]*)"')
+
+# Entrada completa en bytes: línea #EXTINF con nombre seguida de una URL (índice mmap)
+_RE_EXTINF_ENTRY = re.compile(rb'^[ \t]*(#EXTINF:)[^\n]*,[^\n]*\n[ \t\r]*https?://', re.MULTILINE)
+
+# Versión del parser: si cambia la forma de extraer canales, las cachés se invalidan
+PARSER_VERSION = 3
+
+# Carpeta oculta (junto a las listas) donde se guardan las cachés compiladas
+CACHE_DIR_NAME = ".channel_cache"
+
+# Extensiones de listas reconocidas. Las comprimidas se leen descomprimiendo al vuelo.
+M3U_EXTENSIONS = ('.m3u', '.m3u8')
+COMPRESSED_EXTENSIONS = {'.gz': gzip.open, '.xz': lzma.open}
+
+# Catálogo binario que escribe el actualizador junto a los grupos (ver save_channel_catalog)
+CATALOG_FILE_NAME = "catalog.bin"
+CATALOG_VERSION = 2
+_CATALOG_MAGIC = b'M3UCAT'
+_CATALOG_PREFIX = struct.Struct('<6sQI')  # Firma, posición y longitud de la cabecera
+
+# Errores posibles al leer un archivo comprimido dañado o truncado
+_READ_ERRORS = (OSError, EOFError, lzma.LZMAError)
+
+# Puertos por defecto que se eliminan al normalizar URLs
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+def normalize_stream_url(url: str) -> str:
+    """
+    Normaliza una URL de stream para detectar duplicados: esquema y host en
+    minúsculas, sin puerto por defecto ni fragmento.
+    """
+    url = url.strip()
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or '').lower()
+    if parts.username is not None:
+        userinfo = parts.username
+        if parts.password is not None:
+            userinfo += f":{parts.password}"
+        netloc = f"{userinfo}@{netloc}"
+    if port is not None and port != _DEFAULT_PORTS.get(scheme):
+        netloc += f":{port}"
+    return urlunsplit((scheme, netloc, parts.path or '/', parts.query, ''))
+
+def stream_key(url: str) -> int:
+    """Hash de 64 bits de la URL normalizada: identifica un stream de forma compacta."""
+    digest = hashlib.blake2b(normalize_stream_url(url).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+def normalize_search_text(text: str) -> str:
+    """Pasa a minúsculas, quita acentos y compacta los espacios (para buscar)."""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(stripped.split())
+
+def _split_compression(file_name: str) -> tuple[str, str]:
+    """Separa la extensión de compresión: 'a.m3u.gz' -> ('a.m3u', '.gz')."""
+    base, ext = os.path.splitext(file_name)
+    if ext.lower() in COMPRESSED_EXTENSIONS:
+        return base, ext.lower()
+    return file_name, ''
+
+def is_m3u_file(file_name: str) -> bool:
+    """Indica si un archivo es una lista M3U (.m3u, .m3u8, opcionalmente .gz/.xz)."""
+    base, _ = _split_compression(file_name)
+    return base.lower().endswith(M3U_EXTENSIONS)
+
+def m3u_display_name(file_name: str) -> str:
+    """Nombre de la lista sin extensiones: 'Deportes.m3u.gz' -> 'Deportes'."""
+    base, _ = _split_compression(file_name)
+    return os.path.splitext(base)[0]
+
+def open_m3u(file_path: str):
+    """Abre una lista M3U en modo texto, descomprimiéndola en streaming si hace falta."""
+    _, compression = _split_compression(file_path)
+    opener = COMPRESSED_EXTENSIONS.get(compression, open)
+    return opener(file_path, 'rt', encoding='utf-8', errors='ignore')
 
-def get_m3u_files() -> List[str]:
+def parse_extinf_attributes(line: str) -> tuple[Dict[str, str], str] | None:
     """
-    Obtiene una lista ordenada de archivos .m3u de la carpeta configurada.
+    Tokeniza una línea #EXTINF en una sola pasada.
+    Devuelve (atributos, nombre) con todos los pares clave="valor",
+    o None si la línea no tiene nombre.
     """
-    path = config.get("PATHS", "iptv_folder_path")
+    match = _RE_EXTINF.match(line)
+    if match:
+        metadata, name = match.groups()
+    else:
+        # Comillas sin cerrar: se corta en la primera coma, como antes
+        parts = line.split(',', 1)
+        if len(parts) < 2:
+            return None
+        metadata, name = parts
+    return dict(_RE_ATTR.findall(metadata)), name.strip()
+
+class ChannelTable(Sequence):
+    """
+    Tabla de canales almacenada por columnas para ahorrar memoria.
+
+    Los campos muy repetidos (grupo, logo, catchup) se guardan una sola vez
+    y cada fila solo guarda su índice. El resto de textos van en un único
+    buffer con sus offsets. Los objetos Channel se crean al acceder a cada fila.
+    """
+
+    # Campos con pocos valores distintos: columna de índices + lista de valores
+    _INTERNED = ('group', 'logo', 'catchup')
+    # Campos casi únicos por canal: van al buffer de texto
+    _POOLED = ('name', 'url', 'tvg_id', 'tvg_name', 'tvg_chno')
+
+    _INTERNED_POS = tuple(Channel._fields.index(f) for f in _INTERNED)
+    _POOLED_POS = tuple(Channel._fields.index(f) for f in _POOLED)
+
+    __slots__ = ('_values', '_ids', '_cols', '_pool', '_pending', '_offsets')
+
+    def __init__(self, channels: Iterable[Channel] = ()):
+        self._values: List[List[str]] = [[] for _ in self._INTERNED]
+        self._ids: List[dict] = [{} for _ in self._INTERNED]
+        self._cols: List[array] = [array('I') for _ in self._INTERNED]
+        # Buffer de textos: el campo k de la fila i va de offsets[n*i+k] a offsets[n*i+k+1]
+        self._pool = ''
+        self._pending: List[str] = []
+        self._offsets = array('I', [0])
+        self.extend(channels)
+
+    @staticmethod
+    def _intern(value: str, values: List[str], ids: dict) -> int:
+        """Devuelve el índice de un valor repetido, añadiéndolo si es nuevo."""
+        index = ids.get(value)
+        if index is None:
+            index = ids[value] = len(values)
+            values.append(value)
+        return index
+
+    def append(self, channel: Channel) -> None:
+        """Añade un canal al final de la tabla."""
+        for k, pos in enumerate(self._INTERNED_POS):
+            self._cols[k].append(self._intern(channel[pos], self._values[k], self._ids[k]))
+
+        end = self._offsets[-1]
+        for pos in self._POOLED_POS:
+            text = channel[pos]
+            end += len(text)
+            self._offsets.append(end)
+            self._pending.append(text)
+
+    def extend(self, channels: Iterable[Channel]) -> None:
+        """Añade varios canales al final de la tabla."""
+        if isinstance(channels, ChannelTable):
+            self._extend_table(channels)
+            return
+        for channel in channels:
+            self.append(channel)
+
+    def _extend_table(self, other: 'ChannelTable') -> None:
+        """Fusiona otra tabla columna a columna, sin crear objetos Channel."""
+        for k in range(len(self._INTERNED)):
+            id_map = [self._intern(v, self._values[k], self._ids[k]) for v in other._values[k]]
+            self._cols[k].extend(id_map[i] for i in other._cols[k])
+
+        base = self._offsets[-1]
+        self._offsets.extend(base + o for o in other._offsets[1:])
+        self._pending.append(other._flush())
+
+    def _flush(self) -> str:
+        """Vuelca al buffer los textos añadidos desde el último acceso."""
+        if self._pending:
+            self._pool += ''.join(self._pending)
+            self._pending = []
+        return self._pool
+
+    @property
+    def groups(self) -> List[str]:
+        """Títulos de grupo distintos, en orden de aparición."""
+        return list(self._values[0])
+
+    def group_of(self, index: int) -> str:
+        """Devuelve el grupo de una fila sin construir el Channel completo."""
+        return self._values[0][self._cols[0][index]]
+
+    def _row(self, index: int) -> Channel:
+        pool = self._flush()
+        row = [''] * len(Channel._fields)
+        for k, pos in enumerate(self._INTERNED_POS):
+            row[pos] = self._values[k][self._cols[k][index]]
+
+        n = len(self._POOLED)
+        offsets = self._offsets
+        base = n * index
+        for k, pos in enumerate(self._POOLED_POS):
+            row[pos] = pool[offsets[base + k]:offsets[base + k + 1]]
+        return Channel._make(row)
+
+    def __len__(self) -> int:
+        return len(self._cols[0])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._row(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("ChannelTable index out of range")
+        return self._row(index)
+
+    def __iter__(self) -> Iterator[Channel]:
+        for i in range(len(self)):
+            yield self._row(i)
+
+    def to_columns(self) -> tuple:
+        """Exporta las columnas en una tupla apta para marshal."""
+        return (
+            tuple(tuple(values) for values in self._values),
+            tuple(col.tobytes() for col in self._cols),
+            self._flush(), self._offsets.tobytes()
+        )
+
+    @classmethod
+    def from_columns(cls, columns: tuple) -> 'ChannelTable':
+        """Reconstruye una tabla a partir de to_columns() sin reparsear nada."""
+        values, cols, pool, offsets = columns
+        table = cls()
+        table._values = [list(v) for v in values]
+        table._ids = [{value: i for i, value in enumerate(v)} for v in table._values]
+        table._cols = [array('I', col) for col in cols]
+        table._pool = pool
+        table._offsets = array('I', offsets)
+        return table
+
+def get_m3u_files(path: Optional[str] = None) -> List[str]:
+    """
+    Obtiene una lista ordenada de listas M3U (.m3u, .m3u8 y sus versiones
+    .gz/.xz) de la carpeta indicada o, por defecto, de la carpeta configurada.
+    """
+    if path is None:
+        path = config.get("PATHS", "iptv_folder_path")
     
     if not path or not os.path.isdir(path):
         logging.warning(f"Ruta IPTV '{path}' no es un directorio válido.")
         return []
     
     try:
-        files = [f for f in os.listdir(path) if f.lower().endswith('.m3u')]
+        files = [f for f in os.listdir(path) if is_m3u_file(f)]
         files.sort()
         return files
     except OSError as e:
         logging.error(f"Error al leer directorio '{path}': {e}")
         return []
 
-def parse_m3u_file(file_path: str) -> List[Channel]:
+def parse_extinf_fields(line: str) -> Dict[str, str] | None:
     """
-    Parsea un archivo M3U optimizado con expresiones regulares.
+    Extrae de una línea #EXTINF (ya sin espacios) los campos de Channel
+    salvo la URL. Devuelve None si la línea no tiene nombre o está mal formada.
+    """
+    try:
+        parsed = parse_extinf_attributes(line)
+        if parsed is None:
+            return None
+
+        attrs, name = parsed
+        fields = {'name': name}
+        for attr, field in _ATTR_FIELDS.items():
+            fields[field] = attrs.get(attr, '')
+        return fields
+    except Exception as e:
+        logging.warning(f"Línea mal formada: {line[:50]}... - {e}")
+        return None
+
+def iter_m3u_channels(file_path: str) -> Iterator[Channel]:
+    """
+    Recorre un archivo M3U línea a línea y va generando los canales.
+    El consumo de memoria es constante sea cual sea el tamaño de la lista.
     """
-    channels = []
-    
     if not os.path.exists(file_path):
         logging.error(f"Archivo M3U no existe: {file_path}")
-        return channels
+        return
 
     try:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
+        f = open_m3u(file_path)
     except Exception as e:
         logging.error(f"No se pudo leer {file_path}: {e}")
-        return channels
+        return
 
-    # Dividir en líneas y procesar
-    lines = content.splitlines()
-    i = 0
-    
-    while i < len(lines):
-        line = lines[i].strip()
-        
-        if line.startswith('#EXTINF:'):
-            try:
-                # Extraer nombre
-                parts = line.split(',', 1)
-                if len(parts) < 2:
-                    i += 1
+    with f:
+        # Campos de la cabecera #EXTINF pendiente de su URL
+        pending = None
+
+        try:
+            for raw_line in f:
+                line = raw_line.strip()
+
+                if pending is not None:
+                    # La línea siguiente a #EXTINF debe ser la URL
+                    fields = pending
+                    pending = None
+                    if line.startswith(('http://', 'https://')):
+                        yield Channel(url=line, **fields)
                     continue
-                    
-                name = parts[1].strip()
-                metadata = parts[0]
-                
-                # Extraer logo y grupo con regex (mucho más rápido)
-                logo_match = _RE_LOGO.search(metadata)
-                group_match = _RE_GROUP.search(metadata)
-                
-                logo = logo_match.group(1) if logo_match else ''
-                group = group_match.group(1) if group_match else ''
-                
-                # La siguiente línea debe ser la URL
-                i += 1
-                if i < len(lines):
-                    url = lines[i].strip()
-                    if url.startswith(('http://', 'https://')):
-                        channels.append(Channel(
-                            name=name,
-                            logo=logo,
-                            url=url,
-                            group=group
-                        ))
-            except Exception as e:
-                logging.warning(f"Línea mal formada: {line[:50]}... - {e}")
-        
-        i += 1
-    
+
+                if not line.startswith('#EXTINF:'):
+                    continue
+
+                pending = parse_extinf_fields(line)
+        except _READ_ERRORS as e:
+            # Archivo comprimido dañado o truncado: se devuelve lo leído hasta aquí
+            logging.error(f"Error al leer {file_path}: {e}")
+
+def _get_cache_path(file_path: str) -> str:
+    """Devuelve la ruta del archivo de caché asociado a una lista M3U."""
+    folder, file_name = os.path.split(os.path.abspath(file_path))
+    return os.path.join(folder, CACHE_DIR_NAME, f"{file_name}.bin")
+
+def _cache_key(file_path: str) -> tuple:
+    """Clave de validez de la caché: versión del parser, tamaño y mtime."""
+    st = os.stat(file_path)
+    return (PARSER_VERSION, st.st_size, st.st_mtime_ns)
+
+def _load_channel_cache(file_path: str) -> ChannelTable | None:
+    """
+    Carga los canales desde la caché si sigue siendo válida.
+    Devuelve None si no hay caché o si el archivo ha cambiado.
+    """
+    cache_path = _get_cache_path(file_path)
+    try:
+        key = _cache_key(file_path)
+        with open(cache_path, 'rb') as f:
+            cached_key, columns = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+    if tuple(cached_key) != key:
+        return None
+
+    try:
+        return ChannelTable.from_columns(columns)
+    except (ValueError, TypeError):
+        return None
+
+def _save_channel_cache(file_path: str, key: tuple, channels: ChannelTable) -> None:
+    """Guarda una instantánea binaria de los canales junto a la lista."""
+    cache_path = _get_cache_path(file_path)
+    tmp_path = f"{cache_path}.tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            marshal.dump((key, channels.to_columns()), f)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logging.warning(f"No se pudo guardar la caché de {file_path}: {e}")
+
+def _safe_cache_key(file_path: str) -> tuple | None:
+    """Como _cache_key, pero devuelve None si el archivo no se puede leer."""
+    try:
+        return _cache_key(file_path)
+    except OSError:
+        return None
+
+def _save_if_unchanged(file_path: str, key: tuple | None, table: ChannelTable) -> None:
+    """Guarda la caché solo si el archivo no cambió mientras se leía."""
+    if key is not None and _safe_cache_key(file_path) == key:
+        _save_channel_cache(file_path, key, table)
+
+def _catalog_path(folder: str) -> str:
+    return os.path.join(folder, CACHE_DIR_NAME, CATALOG_FILE_NAME)
+
+def save_channel_catalog(folder: str, tables: Iterable[tuple[str, ChannelTable]]) -> bool:
+    """
+    Guarda en un solo archivo los canales de todas las listas de una carpeta,
+    ya parseados. Lo escribe el actualizador con los canales que ya ha leído.
+
+    tables da pares (nombre del archivo, tabla) y se consume de uno en uno:
+    cada bloque se escribe en cuanto llega, sin tener todas las tablas en memoria.
+
+    Formato: firma, un bloque marshal por lista (sus columnas y el nombre
+    normalizado de cada canal) y al final la cabecera (índice de listas), cuya
+    posición va junto a la firma. La cabecera guarda el grupo, el número de
+    canales, el tamaño y mtime del archivo M3U y la posición de su bloque,
+    así cada lista se carga sin leer las demás.
+    """
+    path = _catalog_path(folder)
+    tmp_path = f"{path}.tmp"
+    index = {}
+    offset = 0
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            f.write(_CATALOG_PREFIX.pack(_CATALOG_MAGIC, 0, 0))
+            for file_name, table in tables:
+                try:
+                    st = os.stat(os.path.join(folder, file_name))
+                except OSError:
+                    continue
+                keys = [normalize_search_text(channel.name) for channel in table]
+                block = marshal.dumps((table.to_columns(), keys))
+                group = table.groups[0] if len(table) else ''
+                index[file_name] = (group, len(table), st.st_size, st.st_mtime_ns, offset, len(block))
+                f.write(block)
+                offset += len(block)
+
+            header = marshal.dumps((CATALOG_VERSION, PARSER_VERSION, index))
+            f.write(header)
+            f.seek(0)
+            f.write(_CATALOG_PREFIX.pack(_CATALOG_MAGIC, _CATALOG_PREFIX.size + offset, len(header)))
+        os.replace(tmp_path, path)
+        return True
+    except OSError as e:
+        logging.warning(f"No se pudo guardar el catálogo de canales: {e}")
+        return False
+
+# Cabeceras de catálogo ya leídas: ruta -> (clave del archivo, inicio de los bloques, índice)
+_catalog_headers: Dict[str, tuple] = {}
+
+def _read_catalog_header(path: str, f) -> tuple[int, dict] | None:
+    """Lee (o toma de memoria) la cabecera de un catálogo ya abierto."""
+    st = os.fstat(f.fileno())
+    key = (st.st_ino, st.st_size, st.st_mtime_ns)
+    cached = _catalog_headers.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1], cached[2]
+
+    try:
+        magic, header_offset, header_length = _CATALOG_PREFIX.unpack(f.read(_CATALOG_PREFIX.size))
+        if magic != _CATALOG_MAGIC:
+            return None
+        f.seek(header_offset)
+        version, parser_version, index = marshal.loads(f.read(header_length))
+    except (struct.error, EOFError, ValueError, TypeError):
+        return None
+    if version != CATALOG_VERSION or parser_version != PARSER_VERSION:
+        return None
+
+    data_start = _CATALOG_PREFIX.size
+    _catalog_headers[path] = (key, data_start, index)
+    return data_start, index
+
+def load_catalog_entry(file_path: str) -> tuple[ChannelTable, List[str]] | None:
+    """
+    Carga del catálogo de su carpeta los canales de una lista y sus nombres
+    normalizados. Devuelve None si la lista no está en el catálogo o ha
+    cambiado desde que se escribió.
+    """
+    folder, file_name = os.path.split(os.path.abspath(file_path))
+    path = _catalog_path(folder)
+    try:
+        with open(path, 'rb') as f:
+            header = _read_catalog_header(path, f)
+            if header is None:
+                return None
+            data_start, index = header
+            entry = index.get(file_name)
+            if entry is None:
+                return None
+
+            _, _, size, mtime_ns, offset, length = entry
+            st = os.stat(file_path)
+            if (st.st_size, st.st_mtime_ns) != (size, mtime_ns):
+                return None
+
+            f.seek(data_start + offset)
+            columns, keys = marshal.loads(f.read(length))
+        return ChannelTable.from_columns(columns), list(keys)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+def _load_cached_table(file_path: str) -> ChannelTable | None:
+    """Canales ya parseados de una lista: del catálogo o de su caché propia."""
+    entry = load_catalog_entry(file_path)
+    if entry is not None:
+        return entry[0]
+    return _load_channel_cache(file_path)
+
+def iter_cached_m3u_channels(file_path: str) -> Iterator[Channel]:
+    """
+    Igual que iter_m3u_channels, pero usa el catálogo o la caché compilada si
+    el archivo no ha cambiado. Si no hay ninguno, parsea en streaming y genera
+    la caché al terminar.
+    """
+    cached = _load_cached_table(file_path)
+    if cached is not None:
+        logging.info(f"Cargados {len(cached)} canales de la caché de {file_path}")
+        yield from cached
+        return
+
+    key = _safe_cache_key(file_path)
+    table = ChannelTable()
+    for channel in iter_m3u_channels(file_path):
+        table.append(channel)
+        yield channel
+
+    _save_if_unchanged(file_path, key, table)
+
+def parse_m3u_file(file_path: str) -> ChannelTable:
+    """
+    Parsea un archivo M3U completo y devuelve la tabla de canales.
+    Usa el catálogo o la caché compilada cuando el archivo no ha cambiado.
+    """
+    channels = _load_cached_table(file_path)
+    if channels is None:
+        key = _safe_cache_key(file_path)
+        channels = ChannelTable(iter_m3u_channels(file_path))
+        _save_if_unchanged(file_path, key, channels)
     logging.info(f"Parseados {len(channels)} canales de {file_path}")
-    return channels
\ No newline at end of file
+    return channels
+
+def _parse_m3u_worker(file_path: str) -> tuple[tuple, float]:
+    """Parsea una lista en un proceso hijo y devuelve sus columnas y el tiempo."""
+    start = time.perf_counter()
+    table = parse_m3u_file(file_path)
+    return table.to_columns(), time.perf_counter() - start
+
+def _pool_context():
+    """
+    Contexto de los procesos del pool. Se llama desde hilos (workers de la UI,
+    actualizador) y hacer fork de un proceso con hilos puede dejar bloqueos
+    tomados en el hijo: los procesos se crean desde un servidor limpio
+    (forkserver) o desde cero (spawn) donde no existe. A cambio, cada
+    proceso vuelve a importar el programa al arrancar.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+def parse_m3u_files(paths: List[str], max_workers: Optional[int] = None) -> tuple[List[ChannelTable], Dict[str, float]]:
+    """
+    Parsea varias listas en paralelo (un proceso por núcleo) usando su catálogo
+    o caché si la tienen. Devuelve las tablas en el mismo orden que paths y el
+    tiempo de parseo (en segundos) de cada archivo.
+    """
+    timings: Dict[str, float] = {}
+    if not paths:
+        return [], timings
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    try:
+        # Con un solo núcleo o una sola lista el pool solo añade coste
+        if len(paths) == 1 or max_workers <= 1:
+            results = [_parse_m3u_worker(p) for p in paths]
+        else:
+            with ProcessPoolExecutor(max_workers=min(max_workers, len(paths)), mp_context=_pool_context()) as executor:
+                # map() conserva el orden de entrada
+                results = list(executor.map(_parse_m3u_worker, paths))
+    except (OSError, BrokenProcessPool) as e:
+        logging.warning(f"No se pudo usar el pool de procesos ({e}). Parseando en serie.")
+        results = [_parse_m3u_worker(p) for p in paths]
+
+    tables = []
+    for path, (columns, elapsed) in zip(paths, results):
+        tables.append(ChannelTable.from_columns(columns))
+        timings[os.path.basename(path)] = elapsed
+        logging.debug(f"{os.path.basename(path)}: {elapsed:.3f}s")
+    return tables, timings
+
+def parse_all_m3u_files(folder: Optional[str] = None, max_workers: Optional[int] = None,
+                        dedupe: bool = False) -> tuple[ChannelTable, Dict[str, float]]:
+    """
+    Parsea todas las listas de la carpeta IPTV (por defecto la configurada) en paralelo.
+
+    Los canales se fusionan en el orden de get_m3u_files(), así que el
+    resultado es siempre el mismo. Con dedupe=True cada stream aparece una
+    sola vez (ver dedupe_channels), sin llegar a crear la tabla con repetidos.
+    Devuelve la tabla fusionada y el tiempo de parseo (en segundos) de cada archivo.
+    """
+    if folder is None:
+        folder = config.get("PATHS", "iptv_folder_path")
+    files = get_m3u_files(folder)
+
+    start = time.perf_counter()
+    tables, timings = parse_m3u_files([os.path.join(folder, f) for f in files], max_workers)
+    if dedupe:
+        merged = dedupe_channels(itertools.chain.from_iterable(tables))
+    else:
+        merged = ChannelTable()
+        for table in tables:
+            merged.extend(table)
+
+    logging.info(
+        f"Parseados {len(merged)} canales de {len(files)} listas en "
+        f"{time.perf_counter() - start:.2f}s (suma en serie: {sum(timings.values()):.2f}s)"
+    )
+    return merged, timings
+
+def dedupe_channels(channels: Iterable[Channel]) -> ChannelTable:
+    """
+    Elimina streams repetidos entre grupos y listas: cada URL (normalizada)
+    se guarda una sola vez, con los datos de su primera aparición.
+    """
+    unique = ChannelTable()
+    seen: set = set()
+    duplicates = 0
+
+    for channel in channels:
+        key = stream_key(channel.url)
+        if key in seen:
+            duplicates += 1
+            continue
+        seen.add(key)
+        unique.append(channel)
+
+    logging.info(f"Deduplicación: {len(unique)} streams únicos, {duplicates} duplicados eliminados.")
+    return unique
+
+class LazyM3uReader(Sequence):
+    """
+    Lector perezoso de listas M3U muy grandes basado en mmap.
+    Solo admite listas sin comprimir.
+
+    En el primer acceso hace una única pasada sobre los bytes para anotar dónde
+    empieza cada línea #EXTINF válida. El nombre, logo, grupo y URL solo se
+    decodifican cuando se accede a esa fila, así que solo se leen las páginas
+    que se miran.
+    """
+
+    def __init__(self, file_path: str):
+        if _split_compression(file_path)[1]:
+            raise ValueError(f"LazyM3uReader no admite listas comprimidas: {file_path}")
+        self.file_path = file_path
+        self._file = open(file_path, 'rb')
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # mmap no admite archivos vacíos
+            self._mm = None
+        self._offsets: array | None = None
+
+    def _line_bounds(self, start: int) -> tuple[int, int]:
+        """Devuelve (inicio, fin) de la línea que empieza en start, sin el salto."""
+        end = self._mm.find(b'\n', start)
+        if end == -1:
+            end = len(self._mm)
+        return start, end
+
+    def _index(self) -> array:
+        """Recorre los bytes una vez (en el primer acceso) y guarda el offset de cada #EXTINF con URL."""
+        if self._offsets is None:
+            self._offsets = array('Q')
+            if self._mm is not None:
+                self._offsets.extend(m.start(1) for m in _RE_EXTINF_ENTRY.finditer(self._mm))
+            logging.info(f"Indexados {len(self._offsets)} canales de {self.file_path}")
+        return self._offsets
+
+    def __len__(self) -> int:
+        return len(self._index())
+
+    def _row(self, index: int) -> Channel:
+        start, end = self._line_bounds(self._index()[index])
+        line = self._mm[start:end].decode('utf-8', errors='ignore').strip()
+        url_start, url_end = self._line_bounds(end + 1)
+        url = self._mm[url_start:url_end].decode('utf-8', errors='ignore').strip()
+
+        fields = parse_extinf_fields(line) or {'name': ''}
+        return Channel(url=url, **fields)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._row(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("LazyM3uReader index out of range")
+        return self._row(index)
+
+    def __iter__(self) -> Iterator[Channel]:
+        for i in range(len(self)):
+            yield self._row(i)
+
+    def close(self) -> None:
+        """Libera el mapeo y el archivo."""
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    def __enter__(self) -> 'LazyM3uReader':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def open_channel_list(file_path: str) -> Sequence | Iterator[Channel]:
+    """
+    Canales de una lista para mostrarlos por páginas, por la vía más barata:
+    la tabla ya parseada (catálogo o caché), un LazyM3uReader si la lista no
+    está comprimida (solo se decodifican las filas que se muestran) o, para
+    listas comprimidas sin caché, el parseo en streaming.
+    """
+    cached = _load_cached_table(file_path)
+    if cached is not None:
+        logging.info(f"Cargados {len(cached)} canales de la caché de {file_path}")
+        return cached
+    if not _split_compression(file_path)[1]:
+        try:
+            return LazyM3uReader(file_path)
+        except OSError as e:
+            logging.error(f"No se pudo abrir {file_path}: {e}")
+            return []
+    return iter_cached_m3u_channels(file_path)
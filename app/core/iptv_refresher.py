@@ -2,72 +2,988 @@
 
 import requests
 import os
+import io
+import gzip
+import hashlib
+import json
 import logging
-from collections import defaultdict
+import lzma
+import marshal
+import base64
+import shutil
+import time
+import zlib
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from typing import BinaryIO, Iterable, Iterator, Sequence
+from urllib3.exceptions import HTTPError as Urllib3HTTPError
 
 # --- REFACTORIZACIÓN: Importamos el nuevo config ---
 from app.core.config import config
+from app.core.iptv import (
+    CACHE_DIR_NAME, Channel, ChannelTable, parse_extinf_fields, save_channel_catalog, stream_key
+)
+from app.core.iptv_search import update_search_index
 
-def refresh_channels(source_url: str, output_dir: str) -> tuple[int, int]:
+# Resultado de una actualización. unchanged=True si la lista no había cambiado.
+# diff: archivo de grupo -> GroupDiff, solo con los grupos que han cambiado.
+# sources: SourceReport de cada fuente, en orden de prioridad (solo con varias fuentes).
+RefreshResult = namedtuple(
+    'RefreshResult',
+    ['num_groups', 'num_channels', 'duplicates', 'unchanged', 'diff', 'sources'],
+    defaults=(None, None)
+)
+
+class SourceStatus(Enum):
+    UPDATED = 0        # Descargada con contenido nuevo
+    NOT_MODIFIED = 1   # El servidor respondió 304
+    UNCHANGED = 2      # Descargada, pero con el mismo hash que la vez anterior
+    FAILED = 3         # Error: se usa la copia anterior si existe
+
+# Informe de una fuente: tiempo de descarga, bytes recibidos y canales aportados
+SourceReport = namedtuple(
+    'SourceReport',
+    ['url', 'status', 'seconds', 'size', 'channels', 'error'],
+    defaults=(0, '')
+)
+
+# Cambios de un grupo respecto a la actualización anterior (en número de canales)
+GroupDiff = namedtuple('GroupDiff', ['added', 'removed', 'changed'])
+
+# Estado de la última actualización (validadores HTTP y hash del contenido)
+STATE_FILE_NAME = "refresh_state.json"
+
+# Manifiesto por grupo: hash de cada archivo, para saber qué grupos han cambiado
+MANIFEST_FILE_NAME = "group_manifest.bin"
+
+# Canales ya parseados de cada grupo mientras se reparte la lista maestra; con
+# ellos se escribe el catálogo al publicar y después se borra
+CATALOG_SPILL_NAME = "catalog.spill"
+
+# Las generaciones de grupos se guardan en una carpeta oculta junto a la de salida,
+# que pasa a ser un enlace simbólico a la generación activa
+GENERATIONS_SUFFIX = ".generations"
+GENERATION_PREFIX = "gen-"
+STAGING_SUFFIX = ".partial"
+
+# Generaciones que se conservan (la activa y la anterior, para poder volver atrás)
+KEEP_GENERATIONS = 2
+
+# Copias de cada fuente (solo con varias fuentes), dentro de la carpeta de caché
+SOURCES_DIR_NAME = "sources"
+
+# Descargas simultáneas como máximo al combinar varias fuentes
+MAX_PARALLEL_SOURCES = 8
+
+# Las listas maestras se descargan a un archivo parcial junto a las generaciones.
+# Si la conexión se corta (p. ej. un corte del túnel VPN) se reanuda con Range
+# desde el último byte recibido, también en la siguiente actualización.
+DOWNLOAD_PREFIX = "download-"
+PART_SUFFIX = ".part"
+DOWNLOAD_ATTEMPTS = 5
+DOWNLOAD_CHUNK = 1024 * 1024
+
+# Descarga terminada: código HTTP (200 o 304), validadores y bytes recibidos en esta descarga
+_Download = namedtuple('_Download', ['status_code', 'etag', 'last_modified', 'received'])
+
+class IncompleteDownloadError(Exception):
+    """La descarga no tiene la longitud o el hash que anuncia el servidor."""
+
+_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# Firmas de los formatos comprimidos que puede servir el proveedor
+_GZIP_MAGIC = b'\x1f\x8b'
+_XZ_MAGIC = b'\xfd7zXZ\x00'
+
+def get_source_urls() -> list[str]:
+    """
+    URLs configuradas en [IPTV] source_url, de mayor a menor prioridad.
+    Se pueden poner varias separadas por espacios o en varias líneas.
+    """
+    return config.get("IPTV", "source_url", fallback="").split()
+
+def _state_path(output_dir: str) -> str:
+    return os.path.join(output_dir, CACHE_DIR_NAME, STATE_FILE_NAME)
+
+def _load_state(output_dir: str) -> dict:
+    """Carga el estado de la última actualización (vacío si no existe)."""
+    try:
+        with open(_state_path(output_dir), 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        return state if isinstance(state, dict) else {}
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+def _save_state(output_dir: str, state: dict) -> None:
+    """Guarda el estado de la actualización para la próxima petición condicional."""
+    path = _state_path(output_dir)
+    tmp_path = f"{path}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Se sustituye el archivo (no se reescribe): puede ser un enlace duro
+        # compartido con la generación anterior
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=4, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logging.error(f"No se pudo guardar el estado de la actualización: {e}")
+
+def _result_from_state(state: dict) -> RefreshResult:
+    return RefreshResult(
+        num_groups=state.get('num_groups', 0),
+        num_channels=state.get('num_channels', 0),
+        duplicates=state.get('duplicates', 0),
+        unchanged=True,
+        diff={}
+    )
+
+def _manifest_path(output_dir: str) -> str:
+    return os.path.join(output_dir, CACHE_DIR_NAME, MANIFEST_FILE_NAME)
+
+def _load_manifest(output_dir: str) -> dict:
+    """Carga el manifiesto de grupos de la generación actual (vacío si no existe)."""
+    try:
+        with open(_manifest_path(output_dir), 'rb') as f:
+            manifest = marshal.load(f)
+        return manifest if isinstance(manifest, dict) else {}
+    except (OSError, EOFError, ValueError, TypeError):
+        return {}
+
+def _save_manifest(output_dir: str, manifest: dict) -> None:
+    path = _manifest_path(output_dir)
+    tmp_path = f"{path}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            marshal.dump(manifest, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logging.error(f"No se pudo guardar el manifiesto de grupos: {e}")
+
+def _group_streams(path: str | None) -> dict[int, int]:
+    """
+    Huella de cada canal de un archivo de grupo: hash de la URL -> CRC de su
+    línea #EXTINF. Se calcula leyendo el archivo ya escrito, así el diff no
+    necesita guardar nada en memoria mientras se reparte la lista maestra.
+    """
+    streams: dict[int, int] = {}
+    if path is None:
+        return streams
+    try:
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            extinf = None
+            for raw_line in f:
+                line = raw_line.rstrip('\n')
+                if line.startswith('#EXTINF:'):
+                    extinf = line
+                elif extinf is not None:
+                    streams[stream_key(line)] = zlib.crc32(extinf.encode('utf-8'))
+                    extinf = None
+    except OSError:
+        pass
+    return streams
+
+def _diff_group(old_path: str | None, new_path: str | None) -> GroupDiff:
+    """Compara canal a canal la versión anterior y la nueva de un archivo de grupo."""
+    old, new = _group_streams(old_path), _group_streams(new_path)
+    added = sum(1 for key in new if key not in old)
+    removed = sum(1 for key in old if key not in new)
+    changed = sum(1 for key, crc in new.items() if key in old and old[key] != crc)
+    return GroupDiff(added=added, removed=removed, changed=changed)
+
+def _reuse_unchanged_groups(staging: str, output_dir: str, manifest: dict) -> dict:
+    """
+    Sustituye en la generación nueva los grupos idénticos por enlaces duros a
+    los actuales (mismo inode y mtime: ni escritura ni reindexado) y devuelve
+    el diff de los grupos que sí han cambiado.
+    """
+    previous = _load_manifest(output_dir)
+    diff = {}
+    reused = 0
+
+    for name, entry in manifest.items():
+        old_entry = previous.get(name)
+        current_path = os.path.join(output_dir, name)
+        if old_entry is not None and old_entry[0] == entry[0] and os.path.isfile(current_path):
+            staged_path = os.path.join(staging, name)
+            tmp_path = f"{staged_path}.link"
+            try:
+                os.link(current_path, tmp_path)
+                os.replace(tmp_path, staged_path)
+                reused += 1
+            except OSError:
+                pass  # Sin enlaces duros se publica la copia nueva
+            continue
+        # Solo se releen los grupos que han cambiado, de uno en uno
+        old_path = current_path if old_entry is not None else None
+        diff[name] = _diff_group(old_path, os.path.join(staging, name))
+
+    for name in previous:
+        if name not in manifest:
+            diff[name] = _diff_group(os.path.join(output_dir, name), None)
+
+    logging.info(f"Grupos sin cambios: {reused}. Grupos con cambios: {len(diff)}.")
+    for name, group_diff in diff.items():
+        logging.info(
+            f"  {name}: +{group_diff.added} -{group_diff.removed} ~{group_diff.changed}"
+        )
+    return diff
+
+def _open_master_file(f: BinaryIO) -> io.TextIOBase:
+    """
+    Devuelve una lista maestra descargada como flujo de texto, descomprimiendo
+    al vuelo las listas .gz/.xz (se detectan por su firma, no por la URL).
+    """
+    raw = io.BufferedReader(f)
+    magic = raw.peek(6)[:6]
+
+    if magic.startswith(_GZIP_MAGIC):
+        logging.info("Lista maestra comprimida con gzip.")
+        raw = gzip.GzipFile(fileobj=raw)
+    elif magic.startswith(_XZ_MAGIC):
+        logging.info("Lista maestra comprimida con xz.")
+        raw = lzma.LZMAFile(raw)
+
+    return io.TextIOWrapper(raw, encoding='utf-8', errors='ignore')
+
+def _content_hash(path: str) -> str:
+    """Hash de una descarga tal cual está en disco (sin descomprimir)."""
+    hasher = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        while chunk := f.read(DOWNLOAD_CHUNK):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def _download_path(output_dir: str, url: str) -> str:
+    """Archivo parcial de la descarga de una URL, junto a las generaciones."""
+    digest = hashlib.blake2b(url.encode('utf-8'), digest_size=8).hexdigest()
+    return os.path.join(_generations_dir(output_dir), f"{DOWNLOAD_PREFIX}{digest}{PART_SUFFIX}")
+
+def _remove_download(part_path: str) -> None:
+    for path in (part_path, f"{part_path}.json"):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def _load_part_info(part_path: str, url: str) -> dict:
+    """Datos de una descarga a medias (vacío si no hay nada que reanudar)."""
+    try:
+        with open(f"{part_path}.json", 'r', encoding='utf-8') as f:
+            info = json.load(f)
+        size = os.path.getsize(part_path)
+    except (OSError, json.JSONDecodeError):
+        return {}
+    # Sin ETag ni Last-Modified no se puede asegurar que sea el mismo archivo
+    if info.get('url') != url or not (info.get('etag') or info.get('last_modified')):
+        return {}
+    info['size'] = size
+    return info
+
+def _total_length(response: requests.Response, offset: int) -> int | None:
+    """Tamaño total del archivo según Content-Range o Content-Length."""
+    content_range = response.headers.get('Content-Range', '')
+    if '/' in content_range:
+        total = content_range.rsplit('/', 1)[1]
+        return int(total) if total.isdigit() else None
+    length = response.headers.get('Content-Length')
+    return offset + int(length) if length and length.isdigit() else None
+
+def _check_digest(part_path: str, headers) -> None:
+    """Comprueba el hash del archivo si el servidor lo anuncia (Digest o Content-MD5)."""
+    expected = {}
+    for item in headers.get('Digest', '').split(','):
+        algorithm, _, value = item.strip().partition('=')
+        if algorithm.lower() in ('sha-256', 'md5') and value:
+            expected[algorithm.lower().replace('-', '')] = value
+    if headers.get('Content-MD5'):
+        expected.setdefault('md5', headers['Content-MD5'])
+
+    for algorithm, value in expected.items():
+        hasher = hashlib.new(algorithm)
+        with open(part_path, 'rb') as f:
+            while chunk := f.read(DOWNLOAD_CHUNK):
+                hasher.update(chunk)
+        if base64.b64encode(hasher.digest()).decode('ascii') != value:
+            raise IncompleteDownloadError(f"El hash {algorithm} de la descarga no coincide.")
+
+def _download_master(url: str, headers: dict, part_path: str) -> _Download:
+    """
+    Descarga una lista maestra (tal cual, sin descomprimir) en part_path.
+
+    Si la conexión se corta, se reintenta continuando con una petición Range
+    (con If-Range, para no mezclar dos versiones del archivo). Al terminar se
+    comprueba la longitud y, si el servidor lo anuncia, el hash.
+    """
+    os.makedirs(os.path.dirname(part_path), exist_ok=True)
+    last_error = None
+
+    for attempt in range(1, DOWNLOAD_ATTEMPTS + 1):
+        info = _load_part_info(part_path, url)
+        offset = info.get('size', 0)
+        request_headers = dict(headers)
+        # Los rangos se refieren a los bytes tal cual están en el servidor
+        request_headers['Accept-Encoding'] = 'identity'
+        if offset:
+            request_headers['Range'] = f"bytes={offset}-"
+            request_headers['If-Range'] = info.get('etag') or info['last_modified']
+
+        received = 0
+        try:
+            with requests.get(url, headers=request_headers, timeout=60, stream=True) as response:
+                if response.status_code == 304:
+                    _remove_download(part_path)
+                    return _Download(304, '', '', 0)
+
+                if response.status_code == 416 and offset:
+                    # Ya se había recibido todo antes del corte
+                    if _total_length(response, offset) == offset:
+                        _check_digest(part_path, response.headers)
+                        return _Download(200, info.get('etag', ''), info.get('last_modified', ''), 0)
+                    _remove_download(part_path)
+                    continue
+
+                response.raise_for_status()
+
+                resumed = response.status_code == 206 and response.headers.get(
+                    'Content-Range', ''
+                ).startswith(f"bytes {offset}-")
+                if offset and resumed:
+                    logging.info(f"Reanudando la descarga desde {offset / 1048576:.1f} MiB.")
+                else:
+                    offset = 0  # El servidor no admite rangos o el archivo ha cambiado
+
+                total = _total_length(response, offset)
+                etag = response.headers.get('ETag', '') if not resumed else info.get('etag', '')
+                last_modified = (
+                    response.headers.get('Last-Modified', '') if not resumed else info.get('last_modified', '')
+                )
+                with open(f"{part_path}.json", 'w', encoding='utf-8') as f:
+                    json.dump({'url': url, 'etag': etag, 'last_modified': last_modified}, f)
+
+                with open(part_path, 'ab' if offset else 'wb') as f:
+                    for chunk in response.raw.stream(DOWNLOAD_CHUNK, decode_content=False):
+                        f.write(chunk)
+                        received += len(chunk)
+
+                size = offset + received
+                if total is not None and size != total:
+                    if size > total:
+                        _remove_download(part_path)
+                    raise IncompleteDownloadError(f"Recibidos {size} de {total} bytes.")
+                try:
+                    _check_digest(part_path, response.headers)
+                except IncompleteDownloadError:
+                    _remove_download(part_path)
+                    raise
+                return _Download(200, etag, last_modified, received)
+        except requests.HTTPError:
+            raise
+        except (requests.RequestException, Urllib3HTTPError, IncompleteDownloadError) as e:
+            last_error = e
+            if attempt < DOWNLOAD_ATTEMPTS:
+                delay = min(2 ** attempt, 30)
+                logging.warning(
+                    f"Descarga interrumpida ({e}). Reintento {attempt}/{DOWNLOAD_ATTEMPTS - 1} en {delay} s."
+                )
+                time.sleep(delay)
+
+    raise last_error
+
+class _GroupWriter:
+    """
+    Escribe los canales de cada grupo en su archivo a medida que llegan.
+    Cada grupo acumula unas pocas líneas y se vuelca en modo append,
+    así la memoria no depende del tamaño de la lista maestra.
+
+    También calcula el hash del contenido de cada archivo (para el
+    manifiesto). Los canales ya parseados de cada grupo, para el catálogo,
+    se vuelcan junto con sus líneas a un archivo temporal por trozos.
+    """
+
+    # Canales por grupo que se acumulan antes de escribir en disco
+    FLUSH_CHANNELS = 200
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self._buffers: dict[str, list[str]] = {}
+        self._started: set[str] = set()
+        self._hashers: dict = {}
+        # Canales pendientes de cada grupo y trozos ya volcados: (posición, longitud)
+        self._tables: dict[str, ChannelTable] = {}
+        self._chunks: dict[str, list[tuple[int, int]]] = {}
+        self._spill_path = os.path.join(output_dir, CACHE_DIR_NAME, CATALOG_SPILL_NAME)
+        self._spill: BinaryIO | None = None
+
+    @staticmethod
+    def file_name(group_title: str) -> str:
+        # Limpiar el nombre del archivo para evitar caracteres no válidos
+        safe_filename = "".join(c for c in group_title if c.isalnum() or c in (' ', '-')).rstrip()
+        return f"{safe_filename}.m3u"
+
+    def add(self, group_title: str, extinf: str, url: str, channel: Channel | None = None) -> None:
+        """Añade un canal a su grupo, escribiendo a disco si el búfer se llena."""
+        name = self.file_name(group_title)
+        buffer = self._buffers.get(name)
+        if buffer is None:
+            buffer = self._buffers[name] = []
+            self._hashers[name] = hashlib.blake2b(digest_size=16)
+            self._tables[name] = ChannelTable()
+            self._chunks[name] = []
+
+        # Solo los canales que el parser leerá del archivo entran en el catálogo
+        if channel is not None:
+            self._tables[name].append(channel)
+
+        buffer.append(extinf)
+        buffer.append(url)
+        self._hashers[name].update(f"{extinf}\n{url}\n".encode('utf-8'))
+        if len(buffer) >= 2 * self.FLUSH_CHANNELS:
+            self._flush(name)
+
+    def _flush(self, name: str) -> None:
+        buffer = self._buffers[name]
+        if not buffer and name in self._started:
+            return
+        # La primera vez se crea el archivo con su cabecera
+        mode = 'a' if name in self._started else 'w'
+        with open(os.path.join(self.output_dir, name), mode, encoding='utf-8') as f:
+            if mode == 'w':
+                f.write("#EXTM3U\n")
+            f.write('\n'.join(buffer))
+            f.write('\n')
+        self._started.add(name)
+        buffer.clear()
+
+        table = self._tables[name]
+        if len(table):
+            if self._spill is None:
+                os.makedirs(os.path.dirname(self._spill_path), exist_ok=True)
+                self._spill = open(self._spill_path, 'w+b')
+            data = marshal.dumps(table.to_columns())
+            self._chunks[name].append((self._spill.tell(), len(data)))
+            self._spill.write(data)
+            self._tables[name] = ChannelTable()
+
+    def close(self) -> int:
+        """Vuelca lo pendiente y devuelve el número de archivos escritos."""
+        for name in self._buffers:
+            self._flush(name)
+        return len(self._buffers)
+
+    def tables(self) -> Iterator[tuple[str, ChannelTable]]:
+        """
+        Genera (archivo, canales) de cada grupo, de uno en uno, reuniendo sus
+        trozos del archivo temporal. Al terminar borra el archivo temporal.
+        """
+        try:
+            for name, chunks in self._chunks.items():
+                table = ChannelTable()
+                for offset, length in chunks:
+                    self._spill.seek(offset)
+                    table.extend(ChannelTable.from_columns(marshal.loads(self._spill.read(length))))
+                yield name, table
+        finally:
+            if self._spill is not None:
+                self._spill.close()
+                self._spill = None
+            try:
+                os.remove(self._spill_path)
+            except FileNotFoundError:
+                pass
+
+    def manifest(self) -> dict:
+        """Manifiesto de los archivos escritos, apto para marshal: archivo -> (hash,)."""
+        return {name: (hasher.hexdigest(),) for name, hasher in self._hashers.items()}
+
+def refresh_channels(source_url: str | Sequence[str], output_dir: str) -> RefreshResult:
     """
     Descarga un archivo M3U maestro, lo divide por grupos y guarda los archivos.
+    Los streams repetidos dentro de un mismo grupo se escriben una sola vez.
+
+    La petición es condicional (ETag / Last-Modified). Si el servidor responde
+    304 o el contenido descargado tiene el mismo hash que la vez anterior,
+    los archivos existentes no se tocan.
+
+    Con una lista de URLs se combinan varias fuentes (ver refresh_sources).
+
+    Returns:
+        RefreshResult: grupos, canales escritos, duplicados eliminados y si no hubo cambios
     """
-    if not source_url:
+    sources = [source_url] if isinstance(source_url, str) else [url for url in source_url if url]
+    if not sources or not sources[0]:
         raise ValueError("La URL de origen no puede estar vacía.")
+    if len(sources) > 1:
+        return refresh_sources(sources, output_dir)
+    source_url = sources[0]
+
+    headers = dict(_HEADERS)
+    state = _load_state(output_dir)
+    same_source = state.get('source_url') == source_url
+    if same_source:
+        if state.get('etag'):
+            headers['If-None-Match'] = state['etag']
+        if state.get('last_modified'):
+            headers['If-Modified-Since'] = state['last_modified']
 
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-    
     logging.info(f"Descargando lista maestra de canales desde {source_url}")
-    response = requests.get(source_url, headers=headers, timeout=60)
-    response.raise_for_status()  # Lanza una excepción si hay un error HTTP
+    part_path = _download_path(output_dir, source_url)
+    download = _download_master(source_url, headers, part_path)
 
-    master_content = response.text
-    groups = defaultdict(list)
-    total_channels = 0
+    if download.status_code == 304 and same_source:
+        logging.info("La lista maestra no ha cambiado (304). No se reescribe nada.")
+        return _result_from_state(state)
 
-    lines = master_content.splitlines()
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
-        if line.startswith('#EXTINF:'):
-            group_title = 'General'  # Grupo por defecto
-            if 'group-title="' in line:
-                start = line.find('group-title="') + len('group-title="')
-                end = line.find('"', start)
-                group_title = line[start:end].strip()
-
-            channel_info = [line]
-            i += 1
-            # La siguiente línea es la URL
-            if i < len(lines) and (lines[i].strip().startswith('http')):
-                channel_info.append(lines[i].strip())
-                groups[group_title].extend(channel_info)
-                total_channels += 1
-        i += 1
+    # La descarga ya está completa en disco: si el contenido es el mismo no hace falta parsearla
+    content_hash = _content_hash(part_path)
+    validators = {
+        'source_url': source_url,
+        'etag': download.etag,
+        'last_modified': download.last_modified,
+        'content_hash': content_hash,
+    }
+    if same_source and state.get('content_hash') == content_hash:
+        logging.info("La lista maestra no ha cambiado (mismo hash). No se reescribe nada.")
+        _remove_download(part_path)
+        state.update(validators)
+        _save_state(output_dir, state)
+        return _result_from_state(state)
+
+    # Los grupos nuevos se escriben en una generación aparte y solo se publican si hubo cambios
+    staging = _prepare_staging(output_dir)
+    try:
+        # Copias de una configuración anterior con varias fuentes
+        shutil.rmtree(os.path.join(staging, CACHE_DIR_NAME, SOURCES_DIR_NAME), ignore_errors=True)
+        with open(part_path, 'rb') as f:
+            result, writer = _split_master(f, staging)
+        _remove_download(part_path)
+        result = _publish_staging(staging, output_dir, result, writer)
+        staging = None
+    finally:
+        if staging:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    validators.update(
+        num_groups=result.num_groups,
+        num_channels=result.num_channels,
+        duplicates=result.duplicates
+    )
+    _save_state(output_dir, validators)
+    return result
+
+def refresh_sources(source_urls: Sequence[str], output_dir: str) -> RefreshResult:
+    """
+    Combina varias listas maestras en una sola salida por grupos.
+
+    Las fuentes se descargan a la vez (el tiempo total es el de la más lenta),
+    cada una con su propia petición condicional, y se guarda una copia de cada
+    una. Después se reparten por grupos en orden de prioridad (la primera URL
+    es la más prioritaria): un stream que ya aporta una fuente anterior se
+    descarta. Si una fuente falla se usa su copia anterior, si existe.
+
+    Returns:
+        RefreshResult: con el informe de cada fuente en 'sources'
+    """
+    source_urls = list(dict.fromkeys(source_urls))  # Sin URLs repetidas
+    state = _load_state(output_dir)
+    source_states = state.get('sources', {}) if state.get('source_urls') is not None else {}
+
+    staging = _prepare_staging(output_dir)
+    try:
+        sources_dir = os.path.join(staging, CACHE_DIR_NAME, SOURCES_DIR_NAME)
+        os.makedirs(sources_dir, exist_ok=True)
+        paths = [_source_path(sources_dir, url) for url in source_urls]
+        # Copias de fuentes que ya no están configuradas
+        for name in os.listdir(sources_dir):
+            if os.path.join(sources_dir, name) not in paths:
+                os.remove(os.path.join(sources_dir, name))
+
+        start = time.monotonic()
+        workers = min(len(source_urls), MAX_PARALLEL_SOURCES)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="iptv-source") as executor:
+            fetched = list(executor.map(
+                lambda url, path: _fetch_source(
+                    url, path, _download_path(output_dir, url), source_states.get(url, {})
+                ),
+                source_urls, paths
+            ))
+        elapsed = time.monotonic() - start
+
+        reports = [report for report, _ in fetched]
+        usable = [i for i, path in enumerate(paths) if os.path.isfile(path)]
+        if not usable:
+            raise RuntimeError(f"No se pudo descargar ninguna fuente: {reports[0].error}")
+
+        merged_urls = [source_urls[i] for i in usable]
+        unchanged = merged_urls == state.get('source_urls') and all(
+            reports[i].status != SourceStatus.UPDATED for i in usable
+        )
+
+        new_state = {
+            'source_urls': merged_urls,
+            'sources': {source_urls[i]: fetched[i][1] for i in usable},
+        }
+        if unchanged:
+            logging.info("Ninguna fuente ha cambiado. No se reescribe nada.")
+            new_state.update({k: state[k] for k in ('num_groups', 'num_channels', 'duplicates') if k in state})
+            _save_state(output_dir, new_state)
+            _log_source_reports(reports, elapsed)
+            return _result_from_state(new_state)._replace(sources=reports)
+
+        writer = _GroupWriter(staging)
+        files = [open(paths[i], 'r', encoding='utf-8', errors='ignore') for i in usable]
+        try:
+            result, per_source = _write_groups(writer, [_iter_master_entries(f) for f in files])
+        finally:
+            for f in files:
+                f.close()
+
+        for i, channels in zip(usable, per_source):
+            reports[i] = reports[i]._replace(channels=channels)
+        result = result._replace(sources=reports)
+        _log_source_reports(reports, elapsed)
+
+        result = _publish_staging(staging, output_dir, result, writer)
+        staging = None
+    finally:
+        if staging:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    new_state.update(
+        num_groups=result.num_groups,
+        num_channels=result.num_channels,
+        duplicates=result.duplicates
+    )
+    _save_state(output_dir, new_state)
+    return result
+
+def _source_path(sources_dir: str, url: str) -> str:
+    """Copia local de una fuente, nombrada por el hash de su URL."""
+    digest = hashlib.blake2b(url.encode('utf-8'), digest_size=8).hexdigest()
+    return os.path.join(sources_dir, f"{digest}.m3u")
+
+def _fetch_source(url: str, path: str, part_path: str, source_state: dict) -> tuple[SourceReport, dict]:
+    """
+    Descarga una fuente y guarda su copia local descomprimida. Se ejecuta en un hilo.
+    Devuelve el informe y los validadores para la próxima petición condicional.
+    """
+    headers = dict(_HEADERS)
+    has_copy = os.path.isfile(path)
+    if has_copy:
+        if source_state.get('etag'):
+            headers['If-None-Match'] = source_state['etag']
+        if source_state.get('last_modified'):
+            headers['If-Modified-Since'] = source_state['last_modified']
+
+    start = time.monotonic()
+    tmp_path = f"{path}.tmp"
+    try:
+        download = _download_master(url, headers, part_path)
+        if download.status_code == 304 and has_copy:
+            return SourceReport(url, SourceStatus.NOT_MODIFIED, time.monotonic() - start, 0), source_state
+
+        content_hash = _content_hash(part_path)
+        status = SourceStatus.UPDATED
+        if has_copy and source_state.get('content_hash') == content_hash:
+            # La copia local ya tiene este contenido: no se descomprime otra vez
+            status = SourceStatus.UNCHANGED
+        else:
+            with open(part_path, 'rb') as f, _open_master_file(f) as master:
+                with open(tmp_path, 'w', encoding='utf-8') as out:
+                    shutil.copyfileobj(master, out, DOWNLOAD_CHUNK)
+            os.replace(tmp_path, path)
+        _remove_download(part_path)
+
+        validators = {
+            'etag': download.etag,
+            'last_modified': download.last_modified,
+            'content_hash': content_hash,
+        }
+        return SourceReport(url, status, time.monotonic() - start, download.received), validators
+    except (requests.RequestException, Urllib3HTTPError, IncompleteDownloadError,
+            OSError, EOFError, lzma.LZMAError) as e:
+        logging.error(f"Error al descargar la fuente {url}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return SourceReport(url, SourceStatus.FAILED, time.monotonic() - start, 0, error=str(e)), source_state
+
+def _log_source_reports(reports: list[SourceReport], elapsed: float) -> None:
+    logging.info(f"Fuentes descargadas en {elapsed:.1f} s:")
+    for priority, report in enumerate(reports, 1):
+        logging.info(
+            f"  {priority}. {report.url}: {report.status.name}, {report.seconds:.1f} s, "
+            f"{report.size / 1024:.0f} KiB, {report.channels} canales"
+        )
+
+def _publish_staging(staging: str, output_dir: str, result: RefreshResult, writer: _GroupWriter) -> RefreshResult:
+    """Publica la generación preparada y reindexa la búsqueda. Devuelve el resultado con el diff."""
+    manifest = writer.manifest()
+    # Los grupos sin cambios se enlazan a los de la generación actual
+    diff = _reuse_unchanged_groups(staging, output_dir, manifest)
+    _save_manifest(staging, manifest)
+    # Después de enlazar: el catálogo guarda el tamaño y mtime de los archivos definitivos
+    save_channel_catalog(staging, writer.tables())
+
+    _fsync_dir(staging)
+    _swap_generation(staging, output_dir)
+
+    # Reindexar la búsqueda: solo se procesan los grupos que han cambiado
+    try:
+        update_search_index(output_dir)
+    except Exception as e:
+        logging.error(f"No se pudo actualizar el índice de búsqueda: {e}")
+
+    return result._replace(diff=diff)
+
+def _generations_dir(output_dir: str) -> str:
+    """Carpeta oculta con las generaciones: './Archivos M3U/' -> './.Archivos M3U.generations'."""
+    parent, name = os.path.split(os.path.abspath(output_dir))
+    return os.path.join(parent, f".{name}{GENERATIONS_SUFFIX}")
+
+def _list_generations(generations_dir: str) -> list[str]:
+    """Generaciones completas, de la más antigua a la más reciente."""
+    try:
+        names = os.listdir(generations_dir)
+    except OSError:
+        return []
+    return sorted(
+        os.path.join(generations_dir, n) for n in names
+        if n.startswith(GENERATION_PREFIX) and not n.endswith(STAGING_SUFFIX)
+    )
+
+def _link_or_copy(src: str, dst: str) -> None:
+    """Enlace duro (sin copiar datos en la SD) o copia si no es posible."""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+def _prepare_staging(output_dir: str) -> str:
+    """
+    Crea la carpeta de la nueva generación. Todo lo que no sean grupos .m3u
+    (cachés, listas propias del usuario) se traslada desde la generación actual.
+    """
+    generations_dir = _generations_dir(output_dir)
+    os.makedirs(generations_dir, exist_ok=True)
+
+    # Restos de actualizaciones interrumpidas
+    for name in os.listdir(generations_dir):
+        if name.endswith(STAGING_SUFFIX):
+            shutil.rmtree(os.path.join(generations_dir, name), ignore_errors=True)
 
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-        logging.info(f"Directorio de salida creado: {output_dir}")
+    staging = os.path.join(generations_dir, f"{GENERATION_PREFIX}{time.time_ns()}{STAGING_SUFFIX}")
+    os.makedirs(staging)
 
-    # Limpiar archivos .m3u antiguos
+    if os.path.isdir(output_dir):
+        for entry in os.scandir(output_dir):
+            if entry.name.endswith(".m3u"):
+                continue
+            target = os.path.join(staging, entry.name)
+            if entry.is_dir(follow_symlinks=False):
+                shutil.copytree(entry.path, target, copy_function=_link_or_copy)
+            else:
+                _link_or_copy(entry.path, target)
+    return staging
+
+def _fsync_dir(path: str) -> None:
+    """Asegura en disco los archivos de una carpeta y la propia carpeta."""
+    for entry in os.scandir(path):
+        if entry.is_file(follow_symlinks=False):
+            with open(entry.path, 'rb') as f:
+                os.fsync(f.fileno())
+    _fsync_path(path)
+
+def _fsync_path(path: str) -> None:
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass  # Algunos sistemas no permiten fsync sobre carpetas
+    finally:
+        os.close(fd)
+
+def _point_output_to(generation: str, output_dir: str) -> None:
+    """Cambia de forma atómica el enlace de la carpeta de salida a otra generación."""
+    output_dir = os.path.abspath(output_dir)
+    parent = os.path.dirname(output_dir)
+    tmp_link = f"{output_dir}.swap"
+    if os.path.lexists(tmp_link):
+        os.remove(tmp_link)
+    os.symlink(os.path.relpath(generation, parent), tmp_link)
+    os.replace(tmp_link, output_dir)
+    _fsync_path(parent)
+
+def _swap_generation(staging: str, output_dir: str) -> None:
+    """
+    Publica la generación preparada sustituyendo el enlace de la carpeta de
+    salida en una sola operación. La generación anterior se conserva.
+    """
+    output_dir = os.path.abspath(output_dir)
+    generation = staging[:-len(STAGING_SUFFIX)]
+    os.rename(staging, generation)
+
+    generations_dir = os.path.dirname(generation)
+    if os.path.isdir(output_dir) and not os.path.islink(output_dir):
+        # Primera vez: la carpeta real pasa a ser la generación inicial
+        legacy = os.path.join(generations_dir, f"{GENERATION_PREFIX}0")
+        try:
+            os.symlink(generation, f"{output_dir}.swap-test")
+            os.remove(f"{output_dir}.swap-test")
+        except OSError as e:
+            logging.warning(f"Sin enlaces simbólicos ({e}). Se reemplazan los archivos en su sitio.")
+            _publish_in_place(generation, output_dir)
+            return
+        os.rename(output_dir, legacy)
+        logging.info(f"Carpeta de canales migrada a generaciones en {generations_dir}")
+
+    _point_output_to(generation, output_dir)
+    logging.info(f"Nueva generación de canales publicada: {os.path.basename(generation)}")
+    _prune_generations(generations_dir, keep=os.path.realpath(output_dir))
+
+def _publish_in_place(generation: str, output_dir: str) -> None:
+    """
+    Alternativa sin enlaces simbólicos: sustituye los .m3u dentro de la carpeta
+    y después la caché (manifiesto, catálogo, estado) por la de la generación.
+    """
     for item in os.listdir(output_dir):
         if item.endswith(".m3u"):
             os.remove(os.path.join(output_dir, item))
-    logging.info("Archivos .m3u antiguos eliminados.")
+    for item in os.listdir(generation):
+        if item.endswith(".m3u"):
+            os.replace(os.path.join(generation, item), os.path.join(output_dir, item))
+
+    # Una carpeta no se puede reemplazar por otra con contenido: la anterior
+    # se aparta con otro nombre y se borra cuando la nueva ya está en su sitio
+    cache_dir = os.path.join(generation, CACHE_DIR_NAME)
+    if os.path.isdir(cache_dir):
+        target = os.path.join(output_dir, CACHE_DIR_NAME)
+        old = f"{target}.old"
+        shutil.rmtree(old, ignore_errors=True)
+        if os.path.lexists(target):
+            os.replace(target, old)
+        os.replace(cache_dir, target)
+        shutil.rmtree(old, ignore_errors=True)
+    _fsync_path(output_dir)
+    shutil.rmtree(generation, ignore_errors=True)
+
+def _prune_generations(generations_dir: str, keep: str) -> None:
+    """Borra las generaciones antiguas salvo las KEEP_GENERATIONS más recientes y la activa."""
+    generations = _list_generations(generations_dir)
+    for generation in generations[:-KEEP_GENERATIONS]:
+        if os.path.realpath(generation) != keep:
+            shutil.rmtree(generation, ignore_errors=True)
+
+def rollback_channels(output_dir: str) -> bool:
+    """
+    Vuelve a publicar la generación de canales anterior a la activa.
+    Devuelve False si no hay ninguna a la que volver.
+    """
+    if not os.path.islink(os.path.abspath(output_dir)):
+        logging.warning("La carpeta de canales no usa generaciones. Nada que restaurar.")
+        return False
+
+    current = os.path.realpath(output_dir)
+    generations = _list_generations(_generations_dir(output_dir))
+    older = [g for g in generations if g < current]
+    if not older:
+        logging.warning("No hay una generación anterior de canales.")
+        return False
+
+    _point_output_to(older[-1], output_dir)
+    logging.info(f"Restaurada la generación de canales {os.path.basename(older[-1])}")
+    return True
+
+def _split_master(f: BinaryIO, output_dir: str) -> tuple[RefreshResult, _GroupWriter]:
+    """
+    Divide la lista maestra descargada por grupos.
+    Devuelve el resultado y el escritor (con el manifiesto y los canales de cada grupo).
+    """
+    writer = _GroupWriter(output_dir)
+    # Se parsea línea a línea y cada canal va directo a su grupo
+    with _open_master_file(f) as master:
+        result, _ = _write_groups(writer, [_iter_master_entries(master)])
+    return result, writer
+
+def _iter_master_entries(lines: Iterable[str]):
+    """
+    Genera (línea #EXTINF, grupo, URL, Channel) de cada canal de una lista
+    maestra. Channel es None si el parser no lo leería del archivo del grupo.
+    """
+    pending = None  # (línea #EXTINF, grupo, campos) a la espera de su URL
+    for raw_line in lines:
+        line = raw_line.strip()
+
+        if pending is not None:
+            # La siguiente línea es la URL
+            extinf, group_title, fields = pending
+            pending = None
+            if line.startswith('http'):
+                channel = None
+                if fields is not None and line.startswith(('http://', 'https://')):
+                    channel = Channel(url=line, **fields)
+                yield extinf, group_title, line, channel
+            continue
+
+        if line.startswith('#EXTINF:'):
+            fields = parse_extinf_fields(line)
+            # Grupo por defecto
+            group_title = (fields['group'].strip() if fields else '') or 'General'
+            pending = (line, group_title, fields)
+
+def _write_groups(writer: _GroupWriter, sources: list[Iterable[tuple]]) -> tuple[RefreshResult, list[int]]:
+    """
+    Reparte por grupos los canales de una o varias listas, de mayor a menor
+    prioridad. Los streams repetidos en un grupo se escriben una sola vez y
+    los que ya aporta una lista anterior se descartan.
+    Devuelve el resultado y los canales escritos de cada lista.
+    """
+    total_channels = 0
+    duplicates = 0
+    groups = set()
+    # Streams de las listas ya procesadas (hash de la URL normalizada)
+    taken = set()
+    per_source = []
+
+    for entries in sources:
+        # Streams ya escritos en cada grupo por esta lista
+        group_streams = defaultdict(set)
+        written = 0
+        for extinf, group_title, url, channel in entries:
+            key = stream_key(url)
+            streams = group_streams[group_title]
+            if key in streams or key in taken:
+                # Mismo stream repetido: no se vuelve a escribir
+                duplicates += 1
+                continue
+
+            streams.add(key)
+            writer.add(group_title, extinf, url, channel)
+            written += 1
+
+        for group_title, streams in group_streams.items():
+            if streams:
+                groups.add(group_title)
+                taken.update(streams)
+        per_source.append(written)
+        total_channels += written
+
+    writer.close()
 
-    # Guardar nuevos archivos
-    for group_title, content_lines in groups.items():
-        # Limpiar el nombre del archivo para evitar caracteres no válidos
-        safe_filename = "".join(c for c in group_title if c.isalnum() or c in (' ', '-')).rstrip()
-        file_path = os.path.join(output_dir, f"{safe_filename}.m3u")
-        
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write("#EXTM3U\n")
-            f.write('\n'.join(content_lines))
-            f.write('\n')
-    
     num_groups = len(groups)
-    logging.info(f"Proceso completado. {total_channels} canales divididos en {num_groups} grupos.")
-    return num_groups, total_channels
\ No newline at end of file
+    logging.info(
+        f"Lista maestra procesada: {total_channels} canales ({len(taken)} streams únicos) "
+        f"divididos en {num_groups} grupos. {duplicates} duplicados eliminados."
+    )
+    result = RefreshResult(
+        num_groups=num_groups,
+        num_channels=total_channels,
+        duplicates=duplicates,
+        unchanged=False
+    )
+    return result, per_source
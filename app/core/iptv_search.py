@@ -0,0 +1,359 @@
+# app/core/iptv_search.py
+
+import os
+import heapq
+import logging
+import marshal
+import threading
+from array import array
+from collections import Counter, namedtuple
+from typing import Dict, List, Optional
+
+from app.core.config import config
+from app.core.iptv import (
+    CACHE_DIR_NAME, ChannelTable, get_m3u_files, load_catalog_entry,
+    normalize_search_text, parse_m3u_files, stream_key
+)
+
+# Si cambia el formato del índice, los índices guardados se descartan
+INDEX_VERSION = 2
+INDEX_FILE_NAME = "search_index.bin"
+
+# En búsquedas difusas se ignoran los trigramas presentes en más de esta fracción
+# de canales (p. ej. "can" de "Canal"): apenas discriminan y son los más caros
+_COMMON_TRIGRAM_RATIO = 0.25
+
+# Puntuación mínima (fracción de trigramas coincidentes) para una coincidencia difusa
+_MIN_FUZZY_SCORE = 0.4
+
+# Letras mínimas de una consulta: con menos no hay ningún trigrama que consultar
+MIN_QUERY_LENGTH = 2
+
+# Al cruzar las listas de trigramas se para con estos candidatos o menos, o
+# si la siguiente lista es este número de veces más larga que los candidatos
+_INTERSECT_ENOUGH = 32
+_INTERSECT_RATIO = 8
+
+# Resultado de búsqueda
+SearchHit = namedtuple('SearchHit', ['score', 'channel', 'file_name'])
+
+def _trigrams(text: str) -> set:
+    """Trigramas de un texto ya normalizado."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class _Segment:
+    """Índice de una sola lista M3U. Se reconstruye solo si el archivo cambia."""
+
+    __slots__ = ('key', 'channels', 'texts', 'name_lengths', 'postings')
+
+    def __init__(self, key: tuple, channels: ChannelTable, texts: List[str], postings: Dict[str, array]):
+        self.key = key
+        self.channels = channels
+        # Texto buscable de cada canal: " nombre | grupo "
+        self.texts = texts
+        self.name_lengths = [text.index(' | ') - 1 for text in texts]
+        self.postings = postings
+
+    @classmethod
+    def build(cls, key: tuple, channels: ChannelTable, names: Optional[List[str]] = None) -> '_Segment':
+        # Del catálogo del actualizador los nombres ya vienen normalizados
+        if names is None:
+            names = [normalize_search_text(channel.name) for channel in channels]
+
+        groups: Dict[str, str] = {}
+        texts = []
+        postings: Dict[str, array] = {}
+        for i, channel in enumerate(channels):
+            group = groups.get(channel.group)
+            if group is None:
+                group = groups[channel.group] = normalize_search_text(channel.group)
+            text = f" {names[i]} | {group} "
+            texts.append(text)
+            for gram in _trigrams(text):
+                posting = postings.get(gram)
+                if posting is None:
+                    posting = postings[gram] = array('I')
+                posting.append(i)
+        return cls(key, channels, texts, postings)
+
+    def to_marshal(self) -> tuple:
+        postings = {gram: ids.tobytes() for gram, ids in self.postings.items()}
+        return tuple(self.key), self.channels.to_columns(), self.texts, postings
+
+    @classmethod
+    def from_marshal(cls, data: tuple) -> '_Segment':
+        key, columns, texts, postings = data
+        return cls(
+            tuple(key),
+            ChannelTable.from_columns(columns),
+            list(texts),
+            {gram: array('I', ids) for gram, ids in postings.items()}
+        )
+
+class ChannelSearchIndex:
+    """
+    Índice de trigramas sobre los nombres y grupos de todas las listas M3U.
+
+    Cada archivo tiene su propio segmento, de modo que update() solo
+    reindexa las listas nuevas o modificadas. El índice se guarda en
+    la carpeta de caché junto a las listas.
+
+    update() lo llama el actualizador desde su hilo mientras la UI busca:
+    nunca modifica el diccionario de segmentos, prepara otro y lo sustituye
+    de una vez. search() trabaja con el diccionario que había al empezar.
+    """
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        self.segments: Dict[str, _Segment] = {}
+        # Estado de la carpeta en el último update(): si no cambia, las listas tampoco
+        self.folder_key: Optional[tuple] = None
+        # Un solo update() o save() a la vez
+        self._lock = threading.Lock()
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.folder, CACHE_DIR_NAME, INDEX_FILE_NAME)
+
+    def __len__(self) -> int:
+        return sum(len(segment.texts) for segment in self.segments.values())
+
+    def current_folder_key(self) -> Optional[tuple]:
+        """
+        Inodo y mtime de la carpeta. El actualizador publica cada generación en
+        una carpeta nueva (o reemplaza los archivos dentro), así que cambia con ellas.
+        """
+        try:
+            st = os.stat(self.folder)
+        except OSError:
+            return None
+        return st.st_ino, st.st_mtime_ns
+
+    def load(self) -> bool:
+        """Carga el índice guardado. Devuelve False si no existe o no es válido."""
+        try:
+            with open(self.index_path, 'rb') as f:
+                version, segments = marshal.load(f)
+            if version != INDEX_VERSION:
+                return False
+            self.segments = {name: _Segment.from_marshal(data) for name, data in segments.items()}
+            return True
+        except (OSError, EOFError, ValueError, TypeError) as e:
+            logging.debug(f"No se pudo cargar el índice de búsqueda: {e}")
+            return False
+
+    def save(self) -> bool:
+        """Guarda el índice en disco de forma atómica."""
+        with self._lock:
+            return self._save()
+
+    def _save(self) -> bool:
+        tmp_path = f"{self.index_path}.tmp"
+        data = {name: segment.to_marshal() for name, segment in self.segments.items()}
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                marshal.dump((INDEX_VERSION, data), f)
+            os.replace(tmp_path, self.index_path)
+            return True
+        except OSError as e:
+            logging.error(f"No se pudo guardar el índice de búsqueda: {e}")
+            return False
+
+    def update(self, files: Optional[List[str]] = None) -> tuple[int, int]:
+        """
+        Sincroniza el índice con las listas de la carpeta.
+        Devuelve (listas reindexadas, listas eliminadas del índice).
+        """
+        with self._lock:
+            return self._update(files)
+
+    def _update(self, files: Optional[List[str]]) -> tuple[int, int]:
+        folder_key = self.current_folder_key()
+        if files is None:
+            files = get_m3u_files(self.folder)
+
+        reindexed = 0
+        current = set(files)
+        segments = {name: segment for name, segment in self.segments.items() if name in current}
+        removed = [name for name in self.segments if name not in current]
+
+        # Listas nuevas o modificadas que no están en el catálogo: se parsean en paralelo
+        to_parse = []
+        for name in files:
+            path = os.path.join(self.folder, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            key = (st.st_size, st.st_mtime_ns)
+            segment = segments.get(name)
+            if segment is not None and segment.key == key:
+                continue
+            entry = load_catalog_entry(path)
+            if entry is not None:
+                segments[name] = _Segment.build(key, *entry)
+                reindexed += 1
+            else:
+                to_parse.append((name, path, key))
+
+        if to_parse:
+            tables, _ = parse_m3u_files([path for _, path, _ in to_parse])
+            for (name, _, key), table in zip(to_parse, tables):
+                segments[name] = _Segment.build(key, table)
+            reindexed += len(to_parse)
+
+        # Se conserva el orden de las listas (afecta al desempate de search())
+        self.segments = {name: segments[name] for name in files if name in segments}
+        self.folder_key = folder_key
+
+        if reindexed or removed:
+            logging.info(
+                f"Índice de búsqueda actualizado: {reindexed} listas reindexadas, "
+                f"{len(removed)} eliminadas, {len(self)} canales."
+            )
+        return reindexed, len(removed)
+
+    def search(self, query: str, limit: int = 50, fuzzy: bool = True) -> List[SearchHit]:
+        """
+        Busca canales por subcadena (en nombre o grupo) y, si faltan
+        resultados, por similitud de trigramas. Devuelve los mejores primero.
+        """
+        q = normalize_search_text(query)
+        if len(q) < MIN_QUERY_LENGTH:
+            return []
+        # update() puede sustituir los segmentos mientras tanto: se usa siempre esta versión
+        segments = self.segments
+
+        # (puntuación, -orden de la lista, -canal) de cada coincidencia: con la
+        # misma puntuación, primero las primeras listas y los primeros canales
+        matches: List[tuple] = []
+        file_names = list(segments)
+        needle = q if len(q) >= 3 else f" {q}"
+        grams = _trigrams(needle)
+        for rank, segment in enumerate(segments.values()):
+            texts = segment.texts
+            name_lengths = segment.name_lengths
+            append = matches.append
+            for i in self._substring_candidates(segment, grams):
+                pos = texts[i].find(needle)
+                if pos == -1:
+                    continue
+                # Primero coincidencias en el nombre, al inicio y en nombres cortos
+                name_length = name_lengths[i]
+                score = 2.0 if pos <= name_length else 1.5
+                if pos <= 1:
+                    score += 0.5
+                append((score - name_length / 1000, -rank, -i))
+
+        if fuzzy and len(matches) < limit:
+            # _fuzzy_scores trabaja con claves (orden de la lista, canal)
+            scored = {(-rank, -i): score for score, rank, i in matches}
+            self._fuzzy_scores(segments, q, scored)
+            matches = [(score, -rank, -i) for (rank, i), score in scored.items()]
+
+        # Solo se ordenan los mejores (no todas las coincidencias). El mismo stream
+        # puede estar en varias listas y se muestra una sola vez: si al quitar
+        # repetidos faltan resultados, se piden más.
+        wanted = limit
+        while True:
+            hits = []
+            seen = set()
+            for score, rank, i in heapq.nlargest(wanted, matches):
+                file_name = file_names[-rank]
+                channel = segments[file_name].channels[-i]
+                key = stream_key(channel.url)
+                if key in seen:
+                    continue
+                seen.add(key)
+                hits.append(SearchHit(score=score, channel=channel, file_name=file_name))
+                if len(hits) >= limit:
+                    return hits
+            if wanted >= len(matches):
+                return hits
+            wanted *= 2
+
+    @staticmethod
+    def _substring_candidates(segment: _Segment, grams: set):
+        """
+        Canales que contienen todos los trigramas de la consulta: se cruzan
+        sus listas empezando por la más corta. La comprobación exacta la hace
+        search() con str.find.
+        """
+        postings = []
+        for gram in grams:
+            posting = segment.postings.get(gram)
+            if posting is None:
+                return ()
+            postings.append(posting)
+        postings.sort(key=len)
+
+        candidates = postings[0]
+        for posting in postings[1:]:
+            # Recorrer una lista mucho más larga que los candidatos cuesta más
+            # que comprobarlos con str.find
+            if len(candidates) <= _INTERSECT_ENOUGH or len(posting) > _INTERSECT_RATIO * len(candidates):
+                break
+            if not isinstance(candidates, set):
+                candidates = set(candidates)
+            candidates.intersection_update(posting)
+        return candidates
+
+    def _fuzzy_scores(self, segments: Dict[str, _Segment], q: str, scored: Dict[tuple, float]) -> None:
+        """
+        Añade coincidencias aproximadas puntuadas por trigramas compartidos.
+        La puntuación es la fracción de trigramas puntuados que aparecen en el
+        canal: no cuentan los muy comunes (que se ignoran) ni los que no están
+        en ningún canal (los de la errata).
+        """
+        grams = _trigrams(f" {q} ")
+        for rank, segment in enumerate(segments.values()):
+            limit = max(1, int(len(segment.texts) * _COMMON_TRIGRAM_RATIO))
+            postings = [segment.postings[g] for g in grams if g in segment.postings]
+            if not postings:
+                continue
+            selective = [p for p in postings if len(p) <= limit] or postings
+
+            counts = Counter()
+            for posting in selective:
+                counts.update(posting)
+
+            for i, count in counts.items():
+                score = count / len(selective)
+                if score >= _MIN_FUZZY_SCORE and (rank, i) not in scored:
+                    # Con los mismos trigramas, mejor el nombre más corto (el más parecido)
+                    scored[(rank, i)] = score - segment.name_lengths[i] / 1000
+
+# Índices ya cargados, por carpeta
+_indexes: Dict[str, ChannelSearchIndex] = {}
+
+def _get_index(folder: str) -> ChannelSearchIndex:
+    """Devuelve el índice ya cargado de una carpeta o lo carga del disco."""
+    index = _indexes.get(folder)
+    if index is None:
+        index = ChannelSearchIndex(folder)
+        index.load()
+        _indexes[folder] = index
+    return index
+
+def update_search_index(folder: Optional[str] = None) -> ChannelSearchIndex:
+    """
+    Sincroniza el índice de la carpeta IPTV (por defecto la configurada),
+    reindexando solo las listas modificadas, y lo guarda si ha cambiado.
+    """
+    index = _get_index(folder or config.get("PATHS", "iptv_folder_path"))
+    reindexed, removed = index.update()
+    if reindexed or removed or not os.path.exists(index.index_path):
+        index.save()
+    return index
+
+def search_channels(query: str, limit: int = 50) -> List[SearchHit]:
+    """
+    Busca canales en todas las listas de la carpeta IPTV configurada. Las
+    listas solo se vuelven a revisar si la carpeta ha cambiado (un stat).
+    """
+    folder = config.get("PATHS", "iptv_folder_path")
+    index = _get_index(folder)
+    if index.folder_key is None or index.folder_key != index.current_folder_key():
+        index = update_search_index(folder)
+    return index.search(query, limit=limit)
@@ -0,0 +1,213 @@
+# app/core/media_duplicates.py
+
+import hashlib
+import logging
+import os
+import sqlite3
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.core.media_library import connect_library, sync_library
+
+# Vídeos idénticos. verified indica que se ha comparado el contenido completo
+# (o que el archivo es tan pequeño que el hash parcial ya lo cubre entero).
+DuplicateGroup = namedtuple('DuplicateGroup', ['size', 'paths', 'verified'])
+
+# Resultado de la búsqueda. reclaimable: bytes que se liberarían dejando una copia de cada grupo.
+DuplicateReport = namedtuple('DuplicateReport', ['groups', 'reclaimable', 'files_hashed', 'bytes_read'])
+
+# Bytes que se leen del principio y del final de cada candidato
+PARTIAL_BYTES = 1024 * 1024
+_CHUNK = 1024 * 1024
+
+# Lecturas simultáneas. Son lecturas de disco: en un USB, más hilos no ayudan.
+HASH_WORKERS = 2
+
+# Hashes que se guardan juntos en una transacción corta (nunca mientras se lee un archivo)
+_WRITE_EVERY = 50
+
+def _partial_hash(path: str, size: int) -> Tuple[bytes, int]:
+    """Hash del tamaño + primer y último MiB. Devuelve (hash, bytes leídos)."""
+    h = hashlib.blake2b(size.to_bytes(8, 'little'), digest_size=16)
+    with open(path, 'rb') as f:
+        if size <= 2 * PARTIAL_BYTES:
+            data = f.read()
+            h.update(data)
+            return h.digest(), len(data)
+        head = f.read(PARTIAL_BYTES)
+        f.seek(size - PARTIAL_BYTES)
+        tail = f.read(PARTIAL_BYTES)
+    h.update(head)
+    h.update(tail)
+    return h.digest(), len(head) + len(tail)
+
+def _full_hash(path: str) -> Tuple[bytes, int]:
+    """Hash del archivo completo. Solo para confirmar candidatos que ya coinciden en el parcial."""
+    h = hashlib.blake2b(digest_size=16)
+    read = 0
+    with open(path, 'rb') as f:
+        while chunk := f.read(_CHUNK):
+            h.update(chunk)
+            read += len(chunk)
+    return h.digest(), read
+
+def _under_roots(path: str, prefixes: Tuple[str, ...]) -> bool:
+    return not prefixes or path.startswith(prefixes)
+
+def _candidates(conn: sqlite3.Connection, prefixes: Tuple[str, ...]) -> Dict[int, List[Tuple[str, int]]]:
+    """Vídeos de la biblioteca agrupados por tamaño, solo los tamaños repetidos: (ruta, mtime_ns)."""
+    rows = conn.execute(
+        "SELECT path, size, mtime_ns FROM files WHERE size > 0 AND size IN "
+        "(SELECT size FROM files GROUP BY size HAVING COUNT(*) > 1)"
+    )
+    by_size: Dict[int, List[Tuple[str, int]]] = defaultdict(list)
+    for path, size, mtime_ns in rows:
+        if _under_roots(path, prefixes):
+            by_size[size].append((path, mtime_ns))
+    return {size: files for size, files in by_size.items() if len(files) > 1}
+
+def _drop_hard_links(files: Iterable[Tuple[str, int]]) -> List[Tuple[str, int, int]]:
+    """
+    Quita los enlaces duros al mismo archivo (borrarlos no libera espacio) y
+    los archivos que ya no existen o están vacíos. Devuelve (ruta, tamaño,
+    mtime_ns) con el tamaño y el mtime actuales, no los de la biblioteca.
+    """
+    seen = set()
+    result = []
+    for path, _ in files:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        inode = (st.st_dev, st.st_ino)
+        if inode not in seen and st.st_size > 0:
+            seen.add(inode)
+            result.append((path, st.st_size, st.st_mtime_ns))
+    return result
+
+def _hashes(conn: sqlite3.Connection, column: str, files: List[Tuple[str, int, int]],
+            hasher, executor: ThreadPoolExecutor, stats: Dict[str, int]) -> Dict[str, bytes]:
+    """
+    Hash (parcial o completo) de cada archivo (ruta, tamaño, mtime_ns). Los que
+    ya están en la biblioteca con el mismo tamaño y mtime no se vuelven a leer.
+    """
+    result: Dict[str, bytes] = {}
+    missing = []
+    for path, size, mtime_ns in files:
+        row = conn.execute(
+            f"SELECT {column} FROM hashes WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (path, size, mtime_ns)
+        ).fetchone()
+        if row is not None and row[0] is not None:
+            result[path] = row[0]
+        else:
+            missing.append((path, size, mtime_ns))
+
+    def run(item):
+        path, size, _ = item
+        try:
+            return item, hasher(path, size)
+        except OSError as e:
+            logging.warning(f"No se pudo leer '{path}': {e}")
+            return item, None
+
+    def store(rows):
+        # Si el archivo ha cambiado, los hashes guardados ya no valen
+        conn.executemany(
+            "DELETE FROM hashes WHERE path = ? AND (size != ? OR mtime_ns != ?)",
+            [(path, size, mtime_ns) for path, size, mtime_ns, _ in rows]
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO hashes (path, size, mtime_ns) VALUES (?, ?, ?)",
+            [(path, size, mtime_ns) for path, size, mtime_ns, _ in rows]
+        )
+        conn.executemany(
+            f"UPDATE hashes SET {column} = ? WHERE path = ?",
+            [(digest, path) for path, _, _, digest in rows]
+        )
+        conn.commit()
+        rows.clear()
+
+    pending = []
+    for (path, size, mtime_ns), hashed in executor.map(run, missing):
+        if hashed is None:
+            continue
+        digest, read = hashed
+        stats['files_hashed'] += 1
+        stats['bytes_read'] += read
+        result[path] = digest
+        pending.append((path, size, mtime_ns, digest))
+        if len(pending) >= _WRITE_EVERY:
+            store(pending)
+    if pending:
+        store(pending)
+    return result
+
+def _split(files: List[Tuple[str, int, int]], digests: Dict[str, bytes]) -> List[List[Tuple[str, int, int]]]:
+    """Agrupa por hash y se queda con los grupos de más de un archivo."""
+    groups = defaultdict(list)
+    for item in files:
+        digest = digests.get(item[0])
+        if digest is not None:
+            groups[digest].append(item)
+    return [group for group in groups.values() if len(group) > 1]
+
+def find_duplicates(roots: Iterable[str], db_path: Optional[str] = None, verify: bool = False,
+                    sync: bool = True, max_workers: Optional[int] = None) -> DuplicateReport:
+    """
+    Busca vídeos repetidos (aunque tengan otro nombre) bajo una o varias carpetas.
+
+    Parte de los tamaños guardados en la biblioteca: solo los archivos con el
+    mismo tamaño que otro son candidatos, y de ellos se lee el primer y el
+    último MiB. Con verify=True los que coinciden se comparan enteros; sin él,
+    nunca se lee un archivo completo. Los hashes se guardan en la biblioteca.
+    """
+    roots = [os.path.abspath(root) for root in roots]
+    if sync:
+        # Sincronización incremental: solo relee las carpetas que han cambiado
+        for root in roots:
+            for _ in sync_library(root, db_path):
+                pass
+    prefixes = tuple(os.path.join(root, '') for root in roots)
+
+    stats = {'files_hashed': 0, 'bytes_read': 0}
+    conn = connect_library(db_path)
+    executor = ThreadPoolExecutor(max_workers=max_workers or HASH_WORKERS, thread_name_prefix="media-hash")
+    try:
+        library = (item for files in _candidates(conn, prefixes).values() for item in files)
+        # El archivo puede haber cambiado desde la sincronización: se reagrupa por el tamaño actual
+        by_size = defaultdict(list)
+        for item in _drop_hard_links(library):
+            by_size[item[1]].append(item)
+        by_size = {size: files for size, files in by_size.items() if len(files) > 1}
+        candidates = [item for files in by_size.values() for item in files]
+
+        partial = _hashes(conn, 'partial', candidates, _partial_hash, executor, stats)
+        matches = [g for files in by_size.values() for g in _split(files, partial)]
+
+        groups = []
+        for group in matches:
+            size = group[0][1]
+            # Hasta 2 MiB el hash parcial ya es del archivo entero
+            if size <= 2 * PARTIAL_BYTES:
+                groups.append(DuplicateGroup(size, sorted(p for p, _, _ in group), True))
+            elif verify:
+                full = _hashes(conn, 'full', group, lambda path, _: _full_hash(path), executor, stats)
+                groups.extend(
+                    DuplicateGroup(size, sorted(p for p, _, _ in sub), True)
+                    for sub in _split(group, full)
+                )
+            else:
+                groups.append(DuplicateGroup(size, sorted(p for p, _, _ in group), False))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        conn.close()
+
+    groups.sort(key=lambda g: g.size * (len(g.paths) - 1), reverse=True)
+    reclaimable = sum(g.size * (len(g.paths) - 1) for g in groups)
+    logging.info(
+        f"Duplicados: {len(groups)} grupos, {reclaimable / 1024**3:.2f} GiB recuperables. "
+        f"{stats['files_hashed']} archivos leídos ({stats['bytes_read'] / 1024**2:.1f} MiB)."
+    )
+    return DuplicateReport(groups, reclaimable, stats['files_hashed'], stats['bytes_read'])
@@ -0,0 +1,237 @@
+# app/core/media_library.py
+
+import os
+import logging
+import sqlite3
+import stat
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.core.config import config
+from app.core.local_media import SCAN_WORKERS, is_video_file
+
+# Si cambia el esquema, la base de datos se reconstruye con un escaneo completo
+LIBRARY_SCHEMA_VERSION = 3
+
+# Segundos que espera un escritor si otro tiene la base de datos bloqueada
+# (sincronización, caché de ffprobe, búsqueda de duplicados...)
+BUSY_TIMEOUT = 30.0
+
+# Resolución del mtime en los sistemas de archivos más bastos (FAT/exFAT: 2 s)
+_MTIME_RESOLUTION_NS = 2_000_000_000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path     TEXT PRIMARY KEY,
+    parent   TEXT,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs(parent);
+CREATE TABLE IF NOT EXISTS files (
+    path     TEXT PRIMARY KEY,
+    dir      TEXT NOT NULL,
+    size     INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_dir ON files(dir);
+CREATE TABLE IF NOT EXISTS probes (
+    path        TEXT PRIMARY KEY,
+    size        INTEGER NOT NULL,
+    mtime_ns    INTEGER NOT NULL,
+    duration    REAL,
+    container   TEXT,
+    video_codec TEXT,
+    audio_codec TEXT,
+    width       INTEGER,
+    height      INTEGER,
+    bitrate     INTEGER
+);
+CREATE TABLE IF NOT EXISTS hashes (
+    path     TEXT PRIMARY KEY,
+    size     INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    partial  BLOB,
+    full     BLOB
+);
+"""
+
+# Archivo de vídeo tal y como se guarda en la biblioteca
+_FileRow = Tuple[str, int, int]  # (ruta, tamaño, mtime_ns)
+
+def _get_db_path() -> str:
+    return config.get("PATHS", "library_db_path", fallback="media_library.db") or "media_library.db"
+
+def connect_library(db_path: Optional[str] = None) -> sqlite3.Connection:
+    """
+    Abre la base de datos de la biblioteca (modo WAL) y crea el esquema si falta.
+
+    Las escrituras empiezan con BEGIN IMMEDIATE: si otro escritor tiene el
+    bloqueo se espera hasta BUSY_TIMEOUT. Con una transacción diferida que
+    empieza leyendo, pasar a escribir falla al momento con "database is locked".
+    """
+    conn = sqlite3.connect(db_path or _get_db_path(), timeout=BUSY_TIMEOUT, isolation_level="IMMEDIATE")
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version != LIBRARY_SCHEMA_VERSION:
+        if version:
+            logging.info("Esquema de la biblioteca antiguo. Se reconstruye.")
+        conn.executescript(
+            "DROP TABLE IF EXISTS dirs; DROP TABLE IF EXISTS files; "
+            "DROP TABLE IF EXISTS probes; DROP TABLE IF EXISTS hashes;"
+        )
+        conn.executescript(_SCHEMA)
+        conn.execute(f"PRAGMA user_version={LIBRARY_SCHEMA_VERSION}")
+        conn.commit()
+    return conn
+
+def _check_dir(path: str, known_mtime: Optional[int]) -> Tuple[Optional[int], Optional[tuple]]:
+    """
+    Se ejecuta en un hilo. Devuelve (mtime_ns, listado). El mtime es None si la
+    carpeta ya no existe; el listado, None si no ha cambiado desde la última vez.
+    El listado es (vídeos, subcarpetas); solo los vídeos necesitan un stat.
+
+    Si la carpeta ha cambiado hace menos de la resolución del mtime, se
+    devuelve 0 como mtime: otro cambio en ese mismo intervalo no lo movería,
+    así que la próxima sincronización tiene que volver a listarla.
+    """
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return None, None
+    # El mtime de una carpeta cambia al crear, borrar o renombrar algo dentro
+    if mtime_ns == known_mtime:
+        return mtime_ns, None
+
+    videos: List[_FileRow] = []
+    subdirs: List[str] = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif is_video_file(entry.name):
+                        st = entry.stat()
+                        if stat.S_ISREG(st.st_mode):
+                            videos.append((entry.path, st.st_size, st.st_mtime_ns))
+                except OSError:
+                    continue
+    except OSError as e:
+        # Se conserva lo que había en la biblioteca
+        logging.warning(f"No se pudo leer la carpeta '{path}': {e}")
+        return mtime_ns, None
+    if time.time_ns() - mtime_ns < _MTIME_RESOLUTION_NS:
+        mtime_ns = 0
+    return mtime_ns, (videos, subdirs)
+
+def _delete_subtree(conn: sqlite3.Connection, path: str) -> int:
+    """Borra de la biblioteca una carpeta, sus subcarpetas y sus archivos."""
+    subtree = """(
+        WITH RECURSIVE sub(path) AS (
+            SELECT ? UNION ALL SELECT dirs.path FROM dirs JOIN sub ON dirs.parent = sub.path
+        )
+        SELECT path FROM sub
+    )"""
+    removed = conn.execute(f"DELETE FROM files WHERE dir IN {subtree}", (path,)).rowcount
+    conn.execute(f"DELETE FROM dirs WHERE path IN {subtree}", (path,))
+    return removed
+
+def _known_children(conn: sqlite3.Connection, path: str) -> Dict[str, int]:
+    return dict(conn.execute("SELECT path, mtime_ns FROM dirs WHERE parent = ?", (path,)))
+
+def _apply_listing(conn: sqlite3.Connection, path: str, parent: Optional[str], mtime_ns: int,
+                   videos: List[_FileRow], subdirs: List[str], stats: Dict[str, int]) -> None:
+    """Actualiza los archivos y subcarpetas de una carpeta que ha cambiado."""
+    known = {row[0]: row for row in conn.execute(
+        "SELECT path, size, mtime_ns FROM files WHERE dir = ?", (path,)
+    )}
+    current = {row[0] for row in videos}
+
+    gone = [(p,) for p in known if p not in current]
+    conn.executemany("DELETE FROM files WHERE path = ?", gone)
+    stats['removed'] += len(gone)
+
+    for row in videos:
+        old = known.get(row[0])
+        if old == row:
+            continue
+        stats['added' if old is None else 'updated'] += 1
+        conn.execute(
+            "INSERT OR REPLACE INTO files (path, dir, size, mtime_ns) VALUES (?, ?, ?, ?)",
+            (row[0], path, row[1], row[2])
+        )
+
+    current_dirs = set(subdirs)
+    for child in _known_children(conn, path):
+        if child not in current_dirs:
+            stats['removed'] += _delete_subtree(conn, child)
+
+    conn.execute(
+        "INSERT OR REPLACE INTO dirs (path, parent, mtime_ns) VALUES (?, ?, ?)",
+        (path, parent, mtime_ns)
+    )
+
+def sync_library(root: str, db_path: Optional[str] = None, max_workers: Optional[int] = None) -> Iterator[str]:
+    """
+    Sincroniza la biblioteca con el disco y va devolviendo los vídeos.
+
+    Solo se vuelven a listar las carpetas cuyo mtime ha cambiado: del resto
+    basta un stat y sus vídeos salen directamente de la base de datos. Así el
+    coste depende de lo que haya cambiado, no del tamaño de la biblioteca.
+    Las carpetas se comprueban en paralelo, una tarea por carpeta.
+    """
+    root = os.path.abspath(root)
+    start = time.monotonic()
+    conn = connect_library(db_path)
+    executor = ThreadPoolExecutor(max_workers=max_workers or SCAN_WORKERS, thread_name_prefix="media-library")
+    stats = {'dirs': 0, 'listed': 0, 'added': 0, 'removed': 0, 'updated': 0}
+    try:
+        row = conn.execute("SELECT mtime_ns FROM dirs WHERE path = ?", (root,)).fetchone()
+        pending = {executor.submit(_check_dir, root, row[0] if row else None): (root, None)}
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            ready: List[str] = []
+            for future in done:
+                path, parent = pending.pop(future)
+                mtime_ns, listing = future.result()
+                stats['dirs'] += 1
+
+                if mtime_ns is None:
+                    stats['removed'] += _delete_subtree(conn, path)
+                    continue
+
+                known = _known_children(conn, path)
+                if listing is None:
+                    # Carpeta sin cambios: sus vídeos y subcarpetas ya están en la base de datos
+                    ready.extend(file_path for (file_path,) in conn.execute("SELECT path FROM files WHERE dir = ?", (path,)))
+                    children = known
+                else:
+                    videos, subdirs = listing
+                    _apply_listing(conn, path, parent, mtime_ns, videos, subdirs, stats)
+                    stats['listed'] += 1
+                    ready.extend(file_path for file_path, _, _ in videos)
+                    children = {child: known.get(child) for child in subdirs}
+
+                for child, child_mtime in children.items():
+                    pending[executor.submit(_check_dir, child, child_mtime)] = (child, path)
+
+            # Ni se espera al disco ni se cede el control con la transacción abierta:
+            # mientras tanto los demás escritores estarían bloqueados
+            if conn.in_transaction:
+                conn.commit()
+            yield from ready
+    finally:
+        # Si se deja de consumir, lo ya sincronizado se conserva
+        executor.shutdown(wait=False, cancel_futures=True)
+        conn.commit()
+        conn.close()
+
+    logging.info(
+        f"Biblioteca sincronizada en {time.monotonic() - start:.2f} s: "
+        f"{stats['listed']} de {stats['dirs']} carpetas releídas, "
+        f"+{stats['added']} -{stats['removed']} ~{stats['updated']} vídeos."
+    )
@@ -0,0 +1,162 @@
+# app/core/media_probe.py
+
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import subprocess
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from app.core.media_library import connect_library
+
+# Datos técnicos de un vídeo. duration en segundos, bitrate en bit/s.
+MediaInfo = namedtuple(
+    'MediaInfo',
+    ['duration', 'container', 'video_codec', 'audio_codec', 'width', 'height', 'bitrate']
+)
+
+# ffprobe simultáneos como máximo: cada uno es un proceso y en la Raspberry
+# Pi leer de un USB lento con muchos a la vez es más lento que con pocos.
+# Van con la prioridad más baja, como los ffmpeg de las miniaturas.
+PROBE_WORKERS = 2
+PROBE_TIMEOUT = 30
+
+def low_priority_prefix() -> List[str]:
+    """
+    Prefijo para lanzar un proceso con la prioridad de CPU y de disco más
+    baja (nice/ionice, si están instalados), para no afectar a la UI ni a mpv.
+    """
+    prefix = []
+    if shutil.which("nice"):
+        prefix = ["nice", "-n", "19"]
+    if shutil.which("ionice"):
+        prefix = ["ionice", "-c", "3", *prefix]
+    return prefix
+
+def _run_ffprobe(path: str) -> Optional[MediaInfo]:
+    """Analiza un archivo con ffprobe. Devuelve None si no es un vídeo válido."""
+    command = [
+        *low_priority_prefix(), "ffprobe", "-v", "error", "-print_format", "json",
+        "-show_entries", "format=duration,format_name,bit_rate:stream=codec_type,codec_name,width,height",
+        path
+    ]
+    try:
+        proc = subprocess.run(command, capture_output=True, text=True, timeout=PROBE_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        logging.warning(f"ffprobe tardó demasiado con '{path}'.")
+        return None
+    if proc.returncode != 0:
+        logging.warning(f"ffprobe no pudo analizar '{path}': {proc.stderr.strip()[:200]}")
+        return None
+
+    try:
+        data = json.loads(proc.stdout)
+    except json.JSONDecodeError:
+        return None
+    fmt = data.get('format', {})
+    video = next((s for s in data.get('streams', []) if s.get('codec_type') == 'video'), {})
+    audio = next((s for s in data.get('streams', []) if s.get('codec_type') == 'audio'), {})
+
+    def number(value, kind):
+        try:
+            return kind(value)
+        except (TypeError, ValueError):
+            return kind(0)
+
+    return MediaInfo(
+        duration=number(fmt.get('duration'), float),
+        container=fmt.get('format_name', ''),
+        video_codec=video.get('codec_name', ''),
+        audio_codec=audio.get('codec_name', ''),
+        width=number(video.get('width'), int),
+        height=number(video.get('height'), int),
+        bitrate=number(fmt.get('bit_rate'), int)
+    )
+
+def _stat_key(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+def _cached(conn: sqlite3.Connection, path: str, key: Tuple[int, int]) -> Tuple[bool, Optional[MediaInfo]]:
+    """(hay resultado válido en caché, info). La info es None si el análisis falló."""
+    row = conn.execute(
+        "SELECT size, mtime_ns, duration, container, video_codec, audio_codec, width, height, bitrate "
+        "FROM probes WHERE path = ?", (path,)
+    ).fetchone()
+    if row is None or tuple(row[:2]) != key:
+        return False, None
+    # Los análisis fallidos se guardan sin contenedor para no repetirlos
+    return True, MediaInfo(*row[2:]) if row[3] else None
+
+def _store(conn: sqlite3.Connection, path: str, key: Tuple[int, int], info: Optional[MediaInfo]) -> None:
+    values = info or MediaInfo(0.0, '', '', '', 0, 0, 0)
+    conn.execute(
+        "INSERT OR REPLACE INTO probes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (path, *key, *values)
+    )
+
+def get_cached_media_info(path: str, db_path: Optional[str] = None) -> Optional[MediaInfo]:
+    """Datos de un vídeo ya analizado, sin lanzar ffprobe."""
+    key = _stat_key(path)
+    if key is None:
+        return None
+    try:
+        conn = connect_library(db_path)
+    except sqlite3.Error:
+        return None
+    try:
+        return _cached(conn, path, key)[1]
+    finally:
+        conn.close()
+
+def probe_files(paths: Iterable[str], db_path: Optional[str] = None,
+                max_workers: Optional[int] = None) -> Iterator[Tuple[str, MediaInfo]]:
+    """
+    Devuelve (ruta, MediaInfo) de cada vídeo. Los que ya están en caché con el
+    mismo tamaño y mtime salen al momento; el resto se analizan con ffprobe en
+    paralelo (como mucho PROBE_WORKERS procesos) y se guardan en la biblioteca.
+    """
+    conn = connect_library(db_path)
+    executor = None
+    try:
+        misses = []
+        for path in paths:
+            key = _stat_key(path)
+            if key is None:
+                continue
+            found, info = _cached(conn, path, key)
+            if not found:
+                misses.append((path, key))
+            elif info is not None:
+                yield path, info
+
+        if not misses:
+            return
+        if shutil.which("ffprobe") is None:
+            logging.warning("ffprobe no está instalado: no se analizan los vídeos.")
+            return
+
+        logging.info(f"Analizando {len(misses)} vídeos con ffprobe...")
+        executor = ThreadPoolExecutor(max_workers=max_workers or PROBE_WORKERS, thread_name_prefix="ffprobe")
+        futures = {executor.submit(_run_ffprobe, path): (path, key) for path, key in misses}
+        for future in as_completed(futures):
+            path, key = futures[future]
+            info = future.result()
+            # Cada ffprobe tarda mucho más que un commit: así no se espera ni se
+            # cede el control con la biblioteca bloqueada para los demás escritores
+            _store(conn, path, key, info)
+            conn.commit()
+            if info is not None:
+                yield path, info
+    finally:
+        # Si se deja de consumir, lo ya analizado se conserva
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        conn.commit()
+        conn.close()
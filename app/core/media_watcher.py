@@ -0,0 +1,362 @@
+# app/core/media_watcher.py
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import sqlite3
+import struct
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.local_media import is_video_file
+from app.core.media_library import sync_library
+
+# Máscaras de inotify (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_UNMOUNT = 0x00002000
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+_WATCH_MASK = (
+    IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+)
+_EVENT = struct.Struct('iIII')  # wd, mask, cookie, len
+
+# Cambios: (vídeos añadidos, vídeos eliminados)
+ChangeCallback = Callable[[List[str], List[str]], None]
+
+class _Inotify:
+    """Acceso mínimo a inotify mediante ctypes (solo Linux)."""
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library('c') or 'libc.so.6'
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, "inotify no disponible")
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def add_watch(self, path: str) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def rm_watch(self, wd: int) -> None:
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read_events(self):
+        """Devuelve los eventos pendientes como (wd, máscara, nombre)."""
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            events.append((wd, mask, name))
+        return events
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+class MediaWatcher:
+    """
+    Vigila la carpeta de películas y avisa de los vídeos añadidos, borrados o
+    renombrados, sin volver a escanear. Usa inotify en Linux y, si no está
+    disponible (o la carpeta desaparece, p. ej. al desmontar un USB), consulta
+    la biblioteca periódicamente.
+
+    Los eventos se agrupan: se notifica cuando pasan DEBOUNCE segundos sin
+    cambios y no queda ningún vídeo a medio copiar (como mucho, cada MAX_DELAY),
+    así copiar una temporada entera genera una sola actualización.
+
+    Un vídeo a medio copiar que deja de crecer durante COPY_TIMEOUT segundos
+    sin llegar a cerrarse (p. ej. la copia se interrumpió) deja de esperarse.
+    """
+
+    DEBOUNCE = 2.0
+    MAX_DELAY = 60.0
+    POLL_INTERVAL = 15.0
+    COPY_TIMEOUT = 120.0
+
+    def __init__(self, root: str, movies: Iterable[str], on_change: ChangeCallback):
+        self.root = os.path.abspath(root)
+        self.movies: Set[str] = set(movies)
+        self.on_change = on_change
+        self.backend = "inotify"
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Cambios pendientes de notificar: ruta -> True (añadido) / False (eliminado)
+        self._pending: Dict[str, bool] = {}
+        # Vídeos a medio copiar: ruta -> (última vez que se vio crecer, tamaño)
+        self._copying: Dict[str, Tuple[float, int]] = {}
+        self._first_event = 0.0
+        self._last_event = 0.0
+        # La raíz es un punto de montaje (p. ej. un USB): al desmontarse queda la carpeta vacía
+        self._root_is_mount = False
+        # Discos montados dentro de la raíz que se han desmontado: se sondean hasta que vuelvan
+        self._lost_mounts: Set[str] = set()
+        self._last_mount_check = 0.0
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="media-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+
+    # --- Cambios agrupados ---
+
+    def _queue(self, path: str, added: bool) -> None:
+        now = time.monotonic()
+        if not self._pending:
+            self._first_event = now
+        self._last_event = now
+        self._pending[path] = added
+
+    def _queue_tree(self, path: str, added: bool) -> None:
+        """Encola todos los vídeos de una carpeta (añadida) o ya conocidos bajo ella (eliminada)."""
+        if added:
+            for root, _, files in os.walk(path):
+                for name in files:
+                    if is_video_file(name):
+                        self._queue(os.path.join(root, name), True)
+        else:
+            prefix = os.path.join(path, '')
+            for movie in list(self.movies) + list(self._pending):
+                if movie.startswith(prefix):
+                    self._queue(movie, False)
+
+    def _expire_copying(self) -> None:
+        """Deja de esperar las copias que no crecen desde hace COPY_TIMEOUT segundos."""
+        now = time.monotonic()
+        for path, (last_seen, size) in list(self._copying.items()):
+            if now - last_seen < self.COPY_TIMEOUT:
+                continue
+            try:
+                current = os.stat(path).st_size
+            except OSError:
+                # Ya no existe: el borrado se habría notificado por su lado
+                del self._copying[path]
+                continue
+            if current != size:
+                self._copying[path] = (now, current)
+                continue
+            logging.info(f"'{path}' lleva {self.COPY_TIMEOUT:.0f} s sin crecer. Se da por copiado.")
+            del self._copying[path]
+            self._queue(path, True)
+
+    def _flush_due(self) -> bool:
+        if not self._pending:
+            return False
+        now = time.monotonic()
+        if now - self._first_event >= self.MAX_DELAY:
+            return True
+        return now - self._last_event >= self.DEBOUNCE and not self._copying
+
+    def _flush(self) -> None:
+        added = [p for p, is_added in self._pending.items() if is_added and p not in self.movies]
+        removed = [p for p, is_added in self._pending.items() if not is_added and p in self.movies]
+        self._pending.clear()
+        if not added and not removed:
+            return
+        self.movies.update(added)
+        self.movies.difference_update(removed)
+        logging.info(f"Cambios en la biblioteca: +{len(added)} -{len(removed)} vídeos.")
+        try:
+            self.on_change(sorted(added), sorted(removed))
+        except Exception as e:
+            logging.error(f"Error al notificar cambios de la biblioteca: {e}")
+
+    # --- Bucle principal ---
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                inotify = _Inotify()
+            except (OSError, AttributeError) as e:
+                logging.info(f"inotify no disponible ({e}). Se vigila la biblioteca por sondeo.")
+                self.backend = "polling"
+                self._run_polling(until_root_back=False)
+                return
+
+            try:
+                self.backend = "inotify"
+                lost_root = self._run_inotify(inotify)
+            except OSError as e:
+                # Normalmente el límite de vigilancias (ENOSPC): sondeo a partir de aquí
+                logging.warning(f"No se puede vigilar con inotify ({e}). Se pasa a sondeo.")
+                inotify.close()
+                self.backend = "polling"
+                self._run_polling(until_root_back=False)
+                return
+            inotify.close()
+
+            if lost_root:
+                # Carpeta desmontada o borrada: se sondea hasta que vuelva
+                self.backend = "polling"
+                self._run_polling(until_root_back=True)
+
+    def _add_tree(self, inotify: _Inotify, path: str, watches: Dict[int, str]) -> None:
+        """Vigila una carpeta y todas sus subcarpetas (inotify no es recursivo)."""
+        stack = [path]
+        while stack:
+            current = stack.pop()
+            try:
+                watches[inotify.add_watch(current)] = current
+                with os.scandir(current) as entries:
+                    stack.extend(e.path for e in entries if e.is_dir(follow_symlinks=False))
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            except PermissionError as e:
+                logging.warning(f"No se puede vigilar '{current}': {e}")
+
+    def _remove_tree(self, inotify: _Inotify, path: str, watches: Dict[int, str]) -> None:
+        prefix = os.path.join(path, '')
+        for wd, watched in list(watches.items()):
+            if watched == path or watched.startswith(prefix):
+                inotify.rm_watch(wd)
+                del watches[wd]
+
+    def _run_inotify(self, inotify: _Inotify) -> bool:
+        """Procesa eventos hasta stop(). Devuelve True si se pierde la carpeta raíz."""
+        watches: Dict[int, str] = {}
+        if not os.path.isdir(self.root):
+            return True
+        self._root_is_mount = self._is_mount_point(self.root)
+        self._add_tree(inotify, self.root, watches)
+        logging.info(f"Vigilando {len(watches)} carpetas de '{self.root}' con inotify.")
+
+        while not self._stop.is_set():
+            readable, _, _ = select.select([inotify.fd], [], [], 0.5)
+            if readable:
+                for wd, mask, name in inotify.read_events():
+                    if mask & IN_Q_OVERFLOW:
+                        # Se han perdido eventos: se reconcilia con la biblioteca
+                        self._reconcile()
+                        continue
+
+                    directory = watches.get(wd)
+                    if directory is None:
+                        continue
+                    if mask & (IN_UNMOUNT | IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                        watches.pop(wd, None)
+                        if directory == self.root:
+                            self._queue_tree(self.root, False)
+                            self._flush()
+                            return True
+                        # Un disco montado dentro de la raíz: su punto de montaje sigue ahí
+                        # (sus subcarpetas no) y el montaje no genera eventos, así que se sondea
+                        if mask & IN_UNMOUNT and os.path.isdir(directory):
+                            self._remove_tree(inotify, directory, watches)
+                            self._queue_tree(directory, False)
+                            self._lost_mounts.add(directory)
+                            logging.info(f"'{directory}' se ha desmontado.")
+                        continue
+
+                    path = os.path.join(directory, name)
+                    if mask & IN_ISDIR:
+                        if mask & (IN_CREATE | IN_MOVED_TO):
+                            self._add_tree(inotify, path, watches)
+                            self._queue_tree(path, True)
+                        elif mask & (IN_DELETE | IN_MOVED_FROM):
+                            self._remove_tree(inotify, path, watches)
+                            self._queue_tree(path, False)
+                        continue
+
+                    if not is_video_file(name):
+                        continue
+                    if mask & IN_CREATE:
+                        # Copia en curso: se anuncia al cerrarse
+                        self._last_event = time.monotonic()
+                        self._copying[path] = (self._last_event, 0)
+                    elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                        self._copying.pop(path, None)
+                        self._queue(path, True)
+                    elif mask & (IN_DELETE | IN_MOVED_FROM):
+                        self._copying.pop(path, None)
+                        self._queue(path, False)
+
+            if self._copying:
+                self._expire_copying()
+            if self._lost_mounts:
+                self._check_lost_mounts(inotify, watches)
+            if self._flush_due():
+                self._flush()
+        return False
+
+    def _check_lost_mounts(self, inotify: _Inotify, watches: Dict[int, str]) -> None:
+        """Cada POLL_INTERVAL, vuelve a vigilar los discos desmontados que se han montado otra vez."""
+        now = time.monotonic()
+        if now - self._last_mount_check < self.POLL_INTERVAL:
+            return
+        self._last_mount_check = now
+        for path in list(self._lost_mounts):
+            if not os.path.isdir(path):
+                # Carpeta borrada: ya no hay nada que esperar
+                self._lost_mounts.discard(path)
+            elif self._is_mount_point(path):
+                logging.info(f"'{path}' vuelve a estar montado.")
+                self._lost_mounts.discard(path)
+                self._add_tree(inotify, path, watches)
+                self._queue_tree(path, True)
+
+    def _reconcile(self) -> None:
+        """Compara la lista en memoria con la biblioteca sincronizada con el disco."""
+        try:
+            current = set(sync_library(self.root))
+        except sqlite3.Error as e:
+            # Se reintenta en el siguiente sondeo o desbordamiento
+            logging.error(f"No se pudo sincronizar la biblioteca: {e}")
+            return
+        for path in current - self.movies:
+            self._queue(path, True)
+        for path in self.movies - current:
+            self._queue(path, False)
+
+    @staticmethod
+    def _is_mount_point(path: str) -> bool:
+        """La carpeta está en otro dispositivo que su carpeta padre."""
+        try:
+            return os.stat(path).st_dev != os.stat(os.path.dirname(path)).st_dev
+        except OSError:
+            return False
+
+    def _root_available(self) -> bool:
+        """La raíz existe y, si era un punto de montaje, vuelve a estar montada."""
+        if not os.path.isdir(self.root):
+            return False
+        return not self._root_is_mount or self._is_mount_point(self.root)
+
+    def _run_polling(self, until_root_back: bool) -> None:
+        while not self._stop.wait(self.POLL_INTERVAL):
+            if until_root_back and not self._root_available():
+                continue
+            self._reconcile()
+            self._flush()
+            if until_root_back:
+                logging.info(f"'{self.root}' vuelve a estar disponible.")
+                return
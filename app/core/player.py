@@ -4,7 +4,52 @@ import logging
 import subprocess
 import sys
 import os
-from typing import Optional
+from typing import List, Optional
+
+from app.core.config import config
+from app.core.media_probe import MediaInfo, get_cached_media_info
+
+# Decodificadores de vídeo V4L2 del sistema (en la Raspberry Pi 4, bcm2835-codec-decode)
+_V4L2_DEVICES = "/sys/class/video4linux"
+# Resultado de la comprobación: no cambia mientras la aplicación está abierta
+_v4l2m2m_available: Optional[bool] = None
+
+def _has_v4l2m2m() -> bool:
+    """Indica si hay un decodificador V4L2 memoria a memoria (el que usa v4l2m2m-copy)."""
+    global _v4l2m2m_available
+    if _v4l2m2m_available is None:
+        _v4l2m2m_available = False
+        try:
+            for entry in os.scandir(_V4L2_DEVICES):
+                with open(os.path.join(entry.path, "name"), encoding="utf-8", errors="replace") as f:
+                    if "decode" in f.read().lower():
+                        _v4l2m2m_available = True
+                        break
+        except OSError:
+            pass
+        logging.info(f"Decodificador V4L2 por hardware: {'sí' if _v4l2m2m_available else 'no'}")
+    return _v4l2m2m_available
+
+def _decoder_options(info: Optional[MediaInfo]) -> List[str]:
+    """
+    Elige la decodificación según el vídeo ya analizado, en vez de dejar que mpv
+    lo pruebe al arrancar. [PLAYER] hwdec distinto de "auto" se pasa tal cual a mpv.
+
+    Con el decodificador V4L2 de la Raspberry Pi 4: H.264 hasta 1080p por
+    v4l2m2m y HEVC por hardware; el resto va por software con todos los
+    núcleos. En otros equipos mpv elige con auto-safe, que recurre al
+    software si no hay decodificador para el códec.
+    """
+    hwdec = (config.get("PLAYER", "hwdec", fallback="auto") or "auto").strip()
+    if hwdec != "auto":
+        return [f"--hwdec={hwdec}"]
+    if info is None or not info.video_codec or not _has_v4l2m2m():
+        return ["--hwdec=auto-safe"]
+    if info.video_codec == "h264" and info.height <= 1088:
+        return ["--hwdec=v4l2m2m-copy"]
+    if info.video_codec == "hevc":
+        return ["--hwdec=auto-safe"]
+    return ["--hwdec=no", f"--vd-lavc-threads={os.cpu_count() or 1}"]
 
 def play_video(
     file_path: str,
@@ -20,9 +65,10 @@ def play_video(
         is_streaming = file_path.startswith(("http://", "https://"))
         
         # Base del comando con optimizaciones para RPi4
+        media_info = None if is_streaming else get_cached_media_info(file_path)
         command = [
             "mpv",
-            "--hwdec=auto-safe",
+            *_decoder_options(media_info),
             "--fullscreen",
         ]
 
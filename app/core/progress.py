@@ -1,34 +1,114 @@
 # app/core/progress.py
 
+import hashlib
 import logging
 import os
+import threading
 from pathlib import Path
 import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
 MPV_WATCH_LATER_DIR = Path.home() / ".config" / "mpv" / "watch_later"
 
-def _find_progress_file(video_path: str) -> Path | None:
-    if not MPV_WATCH_LATER_DIR.exists():
+# Contenido de la carpeta watch_later, válido mientras no cambie su mtime:
+# nombres de archivo y, construido solo si hace falta, ruta real del vídeo -> archivo
+_index_lock = threading.Lock()
+_index_mtime: Optional[int] = None
+_index_names: Set[str] = set()
+_index_paths: Optional[Dict[str, Path]] = None
+
+def _watch_later_name(path: str) -> str:
+    """Nombre que da mpv al archivo de progreso: MD5 de la ruta en hexadecimal y mayúsculas."""
+    return hashlib.md5(path.encode("utf-8", "surrogateescape")).hexdigest().upper()
+
+def _candidate_names(video_path: str) -> List[str]:
+    """
+    Nombres posibles según cómo haya recibido mpv la ruta. mpv la convierte en
+    absoluta (las versiones antiguas solo anteponen el directorio actual, sin
+    normalizar) antes de calcular el hash.
+    """
+    candidates = [os.path.abspath(video_path), video_path]
+    if not os.path.isabs(video_path):
+        candidates.append(os.path.join(os.getcwd(), video_path))
+    names = []
+    for candidate in candidates:
+        name = _watch_later_name(candidate)
+        if name not in names:
+            names.append(name)
+    return names
+
+def _read_header_path(progress_file: Path) -> Optional[str]:
+    """Ruta del vídeo en la primera línea ("# ruta"), si mpv la escribió."""
+    try:
+        with open(progress_file, encoding="utf-8", errors="surrogateescape") as f:
+            first_line = f.readline()
+    except OSError:
         return None
-        
-    normalized_video_path = os.path.realpath(video_path)
-    
-    for progress_file in MPV_WATCH_LATER_DIR.iterdir():
-        try:
-            content = progress_file.read_text()
-            first_line = content.splitlines()[0]
-            
-            if first_line.startswith("# ") and os.path.realpath(first_line[2:].strip()) == normalized_video_path:
-                return progress_file
-        except (IOError, IndexError):
-            continue
+    if first_line.startswith("# "):
+        return first_line[2:].strip()
     return None
 
-def get_progress(file_path: str) -> float | None:
-    progress_file = _find_progress_file(file_path)
-    if not progress_file:
+def _current_index() -> Tuple[Set[str], Optional[int]]:
+    """Nombres de la carpeta watch_later. Se vuelve a listar solo si cambia su mtime."""
+    global _index_mtime, _index_names, _index_paths
+    try:
+        mtime_ns = MPV_WATCH_LATER_DIR.stat().st_mtime_ns
+    except OSError:
+        return set(), None
+
+    with _index_lock:
+        if mtime_ns != _index_mtime:
+            try:
+                _index_names = set(os.listdir(MPV_WATCH_LATER_DIR))
+            except OSError:
+                return set(), None
+            _index_paths = None
+            _index_mtime = mtime_ns
+        return _index_names, mtime_ns
+
+def _paths_index(mtime_ns: int) -> Dict[str, Path]:
+    """
+    Ruta real del vídeo -> archivo de progreso, leyendo la primera línea de
+    cada archivo una sola vez por cada versión de la carpeta.
+    """
+    global _index_paths
+    with _index_lock:
+        if _index_paths is not None and _index_mtime == mtime_ns:
+            return _index_paths
+        names = list(_index_names)
+
+    paths: Dict[str, Path] = {}
+    for name in names:
+        progress_file = MPV_WATCH_LATER_DIR / name
+        header_path = _read_header_path(progress_file)
+        if header_path:
+            paths[os.path.realpath(header_path)] = progress_file
+
+    with _index_lock:
+        if _index_mtime == mtime_ns:
+            _index_paths = paths
+    return paths
+
+def _lookup(video_path: str, names: Set[str], mtime_ns: int) -> Path | None:
+    # Caso normal: el nombre se deduce de la ruta, sin leer ningún archivo
+    for name in _candidate_names(video_path):
+        if name in names:
+            return MPV_WATCH_LATER_DIR / name
+
+    # Reproducido con otra ruta (enlace simbólico, otro punto de montaje...)
+    normalized_video_path = os.path.realpath(video_path)
+    name = _watch_later_name(normalized_video_path)
+    if name in names:
+        return MPV_WATCH_LATER_DIR / name
+    return _paths_index(mtime_ns).get(normalized_video_path)
+
+def _find_progress_file(video_path: str) -> Path | None:
+    names, mtime_ns = _current_index()
+    if mtime_ns is None or not names:
         return None
-        
+    return _lookup(video_path, names, mtime_ns)
+
+def _read_start(progress_file: Path) -> float | None:
     try:
         content = progress_file.read_text()
         match = re.search(r"^start=([\d\.]+)", content, re.MULTILINE)
@@ -38,6 +118,29 @@ def get_progress(file_path: str) -> float | None:
         logging.error(f"Error al parsear el archivo de progreso '{progress_file.name}': {e}")
     return None
 
+def get_progress(file_path: str) -> float | None:
+    progress_file = _find_progress_file(file_path)
+    if not progress_file:
+        return None
+    return _read_start(progress_file)
+
+def get_progress_many(paths: Iterable[str]) -> Dict[str, Optional[float]]:
+    """
+    Progreso de varios vídeos a la vez: la carpeta watch_later se comprueba una
+    sola vez y solo se leen los archivos de los vídeos con progreso. Puede tardar
+    con listas largas, así que conviene llamarla desde un worker.
+    """
+    paths = list(paths)
+    names, mtime_ns = _current_index()
+    if mtime_ns is None or not names:
+        return dict.fromkeys(paths)
+
+    result: Dict[str, Optional[float]] = {}
+    for path in paths:
+        progress_file = _lookup(path, names, mtime_ns)
+        result[path] = _read_start(progress_file) if progress_file else None
+    return result
+
 def clear_progress(file_path: str) -> None:
     progress_file = _find_progress_file(file_path)
     if progress_file and progress_file.exists():
@@ -0,0 +1,278 @@
+# app/core/thumbnails.py
+
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import threading
+from collections import OrderedDict, namedtuple
+from typing import Callable, Dict, Iterable, List, Optional
+
+from app.core.config import config
+from app.core.media_probe import get_cached_media_info, low_priority_prefix
+
+# Miniatura ya reducida: píxeles RGB (3 bytes por píxel), fila a fila
+Thumbnail = namedtuple('Thumbnail', ['width', 'height', 'pixels'])
+
+# Tamaño en la terminal: cada celda "▀" muestra dos píxeles en vertical
+THUMB_COLUMNS = 32
+THUMB_ROWS = 18
+THUMB_WIDTH = THUMB_COLUMNS
+THUMB_HEIGHT = THUMB_ROWS * 2
+
+# Tope del caché en disco; se borran primero las miniaturas usadas hace más tiempo
+CACHE_MAX_BYTES = 16 * 1024 * 1024
+# Miniaturas decodificadas que se mantienen en memoria
+MEMORY_ITEMS = 256
+
+# ffmpeg simultáneos. Van con la prioridad más baja para no afectar a la UI ni a mpv.
+THUMB_WORKERS = 1
+THUMB_TIMEOUT = 30
+
+# Callback al terminar una miniatura: (ruta del vídeo, miniatura o None si falló)
+ThumbnailCallback = Callable[[str, Optional[Thumbnail]], None]
+
+def _cache_dir() -> str:
+    return config.get("PATHS", "thumbnail_cache_path", fallback="thumbnails") or "thumbnails"
+
+def _frame_time(path: str) -> float:
+    """Segundo del que se extrae el fotograma: el 10% del vídeo (evita créditos y negros)."""
+    info = get_cached_media_info(path)
+    if info is not None and info.duration:
+        return min(info.duration * 0.1, 300.0)
+    return 60.0
+
+def _extract_frame(path: str) -> Optional[bytes]:
+    """Extrae un fotograma reducido a THUMB_WIDTH x THUMB_HEIGHT en RGB sin comprimir."""
+    scale = (
+        f"scale={THUMB_WIDTH}:{THUMB_HEIGHT}:force_original_aspect_ratio=decrease,"
+        f"pad={THUMB_WIDTH}:{THUMB_HEIGHT}:(ow-iw)/2:(oh-ih)/2"
+    )
+
+    def command(seek: float) -> List[str]:
+        # -ss antes de -i: búsqueda rápida por fotogramas clave
+        return [
+            *low_priority_prefix(), "ffmpeg", "-v", "error", "-nostdin", "-ss", f"{seek:.1f}", "-i", path,
+            "-frames:v", "1", "-vf", scale, "-f", "rawvideo", "-pix_fmt", "rgb24", "-"
+        ]
+
+    expected = THUMB_WIDTH * THUMB_HEIGHT * 3
+    # Si el vídeo es más corto que el punto elegido, se reintenta desde el principio
+    for seek in (_frame_time(path), 0.0):
+        try:
+            proc = subprocess.run(command(seek), capture_output=True, timeout=THUMB_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            logging.warning(f"ffmpeg tardó demasiado con la miniatura de '{path}'.")
+            return None
+        if proc.returncode == 0 and len(proc.stdout) == expected:
+            return proc.stdout
+    logging.warning(f"No se pudo generar la miniatura de '{path}'.")
+    return None
+
+class ThumbnailCache:
+    """
+    Miniaturas de los vídeos en disco (con tope de tamaño, LRU) y en memoria.
+    La clave incluye tamaño y mtime: si el archivo cambia, se genera otra.
+    """
+
+    def __init__(self, folder: Optional[str] = None, max_bytes: int = CACHE_MAX_BYTES):
+        self.folder = folder or _cache_dir()
+        self.max_bytes = max_bytes
+        self._memory: OrderedDict[str, Thumbnail] = OrderedDict()
+        self._lock = threading.Lock()
+        self._total = None
+
+    def _file_for(self, path: str) -> Optional[str]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        key = f"{path}\0{st.st_size}\0{st.st_mtime_ns}".encode('utf-8', 'surrogateescape')
+        name = hashlib.blake2b(key, digest_size=16).hexdigest()
+        return os.path.join(self.folder, f"{name}.rgb")
+
+    def peek(self, path: str) -> Optional[Thumbnail]:
+        """Miniatura que ya está en memoria, o None. No toca el disco: apta para la UI."""
+        with self._lock:
+            thumb = self._memory.get(path)
+            if thumb is not None:
+                self._memory.move_to_end(path)
+            return thumb
+
+    def get(self, path: str) -> Optional[Thumbnail]:
+        """Miniatura ya generada, o None. No lanza ffmpeg."""
+        with self._lock:
+            thumb = self._memory.get(path)
+            if thumb is not None:
+                self._memory.move_to_end(path)
+                return thumb
+
+        file_path = self._file_for(path)
+        if file_path is None:
+            return None
+        try:
+            with open(file_path, 'rb') as f:
+                pixels = f.read()
+            # Marca de uso para el LRU del disco
+            os.utime(file_path)
+        except OSError:
+            return None
+        if len(pixels) != THUMB_WIDTH * THUMB_HEIGHT * 3:
+            return None
+        thumb = Thumbnail(THUMB_WIDTH, THUMB_HEIGHT, pixels)
+        self._remember(path, thumb)
+        return thumb
+
+    def put(self, path: str, pixels: bytes) -> Thumbnail:
+        thumb = Thumbnail(THUMB_WIDTH, THUMB_HEIGHT, pixels)
+        file_path = self._file_for(path)
+        if file_path is not None:
+            try:
+                os.makedirs(self.folder, exist_ok=True)
+                tmp_path = f"{file_path}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(pixels)
+                os.replace(tmp_path, file_path)
+                self._evict(len(pixels))
+            except OSError as e:
+                logging.warning(f"No se pudo guardar la miniatura de '{path}': {e}")
+        self._remember(path, thumb)
+        return thumb
+
+    def _remember(self, path: str, thumb: Thumbnail) -> None:
+        with self._lock:
+            self._memory[path] = thumb
+            self._memory.move_to_end(path)
+            while len(self._memory) > MEMORY_ITEMS:
+                self._memory.popitem(last=False)
+
+    def _evict(self, added: int) -> None:
+        """Borra las miniaturas menos usadas si el caché supera el tope."""
+        with self._lock:
+            if self._total is None:
+                self._total = sum(e.stat().st_size for e in os.scandir(self.folder) if e.is_file())
+            else:
+                self._total += added
+            if self._total <= self.max_bytes:
+                return
+
+            entries = sorted(
+                (e for e in os.scandir(self.folder) if e.is_file()),
+                key=lambda e: e.stat().st_mtime_ns
+            )
+            # Se deja un margen para no repetir la limpieza con cada miniatura
+            target = self.max_bytes * 0.9
+            for entry in entries:
+                if self._total <= target:
+                    break
+                try:
+                    size = entry.stat().st_size
+                    os.remove(entry.path)
+                    self._total -= size
+                except OSError:
+                    continue
+
+class ThumbnailPipeline:
+    """
+    Genera miniaturas en segundo plano, en el orden que pida la pantalla.
+
+    want() sustituye la cola pendiente: la pantalla pide primero los vídeos
+    más cercanos al cursor y, al moverse, vuelve a pedir. Lo que ya no está
+    cerca se abandona sin llegar a lanzar ffmpeg.
+    """
+
+    def __init__(self, cache: Optional[ThumbnailCache] = None, workers: int = THUMB_WORKERS):
+        self.cache = cache or ThumbnailCache()
+        self._queue: List[str] = []
+        self._callbacks: Dict[str, ThumbnailCallback] = {}
+        self._in_progress: set = set()
+        self._failed: set = set()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._available = shutil.which("ffmpeg") is not None
+        if not self._available:
+            logging.warning("ffmpeg no está instalado: no se generan miniaturas.")
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"thumbnails-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def want(self, paths: Iterable[str], callback: ThumbnailCallback) -> None:
+        """Pide miniaturas por orden de prioridad, descartando las peticiones anteriores."""
+        if not self._available:
+            return
+        with self._cond:
+            self._queue = [p for p in paths if p not in self._failed and p not in self._in_progress]
+            self._callbacks = {p: callback for p in self._queue}
+            self._cond.notify_all()
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._queue = []
+            self._cond.notify_all()
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                path = self._queue.pop(0)
+                callback = self._callbacks.pop(path)
+                self._in_progress.add(path)
+
+            try:
+                thumb = self.cache.get(path)
+                if thumb is None:
+                    pixels = _extract_frame(path)
+                    if pixels is None:
+                        with self._cond:
+                            self._failed.add(path)
+                    else:
+                        thumb = self.cache.put(path, pixels)
+                callback(path, thumb)
+            except Exception as e:
+                logging.error(f"Error al generar la miniatura de '{path}': {e}")
+            finally:
+                with self._cond:
+                    self._in_progress.discard(path)
+
+_pipeline: Optional[ThumbnailPipeline] = None
+
+def get_thumbnail_pipeline() -> ThumbnailPipeline:
+    """Pipeline compartido por todas las pantallas (se crea al primer uso)."""
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = ThumbnailPipeline()
+    return _pipeline
+
+def render_half_blocks(thumb: Thumbnail):
+    """
+    Convierte una miniatura en texto de Rich: cada celda es un "▀" con el
+    píxel de arriba como color de texto y el de abajo como fondo.
+    """
+    from rich.style import Style
+    from rich.text import Text
+
+    text = Text()
+    width, pixels = thumb.width, thumb.pixels
+    styles: Dict[tuple, Style] = {}
+    for y in range(0, thumb.height - 1, 2):
+        for x in range(width):
+            top = (y * width + x) * 3
+            bottom = top + width * 3
+            key = (pixels[top:top + 3], pixels[bottom:bottom + 3])
+            style = styles.get(key)
+            if style is None:
+                style = styles[key] = Style(
+                    color=f"#{key[0].hex()}", bgcolor=f"#{key[1].hex()}"
+                )
+            text.append("▀", style)
+        text.append("\n")
+    text.rstrip()
+    return text
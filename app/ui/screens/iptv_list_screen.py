@@ -1,13 +1,16 @@
 # app/ui/screens/iptv_list_screen.py
 
 import logging
-from typing import List, Dict, Optional
+from collections.abc import Sequence
+from typing import Callable, Iterable, List, Dict, Optional
 
 from textual.app import ComposeResult
 from textual.screen import Screen
 from textual.widgets import Button, Header, Footer, Static
-from textual.containers import VerticalScroll
+from textual.containers import Horizontal, VerticalScroll
+from textual.worker import get_current_worker
 
+from app.core.iptv import ChannelTable
 from app.core.vpn import disconnect_vpn, VPNStatus
 from app.ui.screens.now_playing_screen import NowPlayingScreen
 from app.ui.screens.confirm_screen import ConfirmScreen
@@ -26,36 +29,157 @@ class IptvListScreen(Screen):
         width: 100%;
         margin: 1;
     }
+
+    #iptv-pager {
+        height: auto;
+    }
+
+    #iptv-pager Button {
+        width: 1fr;
+    }
+
+    #iptv-page-label {
+        width: 2fr;
+        height: 3;
+        content-align: center middle;
+    }
     """
 
-    def __init__(self, channels: List, **kwargs):
+    # Canales por página: solo estos tienen botón (y, con LazyM3uReader, solo estos se decodifican)
+    PAGE_SIZE = 100
+
+    def __init__(self, channels: Iterable | Callable[[], Iterable],
+                 empty_message: str = "No se encontraron canales en el archivo.", **kwargs):
         super().__init__(**kwargs)
-        # Optimización: usar diccionario en lugar de list comprehension
-        self.channel_map: Dict[str, str] = {}
-        self.channel_names: Dict[str, str] = {}
-        
-        for i, channel in enumerate(channels):
-            button_id = f"channel_{i}"
-            self.channel_map[button_id] = channel.url
-            self.channel_names[button_id] = channel.name
+        self.empty_message = empty_message
+        # Origen de los canales: una secuencia (ChannelTable, LazyM3uReader...),
+        # un generador o una función que devuelve cualquiera de los dos. Se
+        # resuelve en un worker, así abrir listas grandes no bloquea la UI.
+        self.channels = channels
+        self.table: Sequence = ()
+        self.page = 0
+        self._loading = True
+        # Botón de la página actual -> índice del canal en la tabla
+        self.channel_map: Dict[str, int] = {}
         
         self.selected_channel_url: Optional[str] = None
         self.selected_channel_name: Optional[str] = None
-        self.channels = channels
 
     def compose(self) -> ComposeResult:
         yield Header(show_clock=True, name="Canales IPTV")
         
         with VerticalScroll(id="iptv-channel-list"):
-            if self.channel_map:
-                for button_id, name in self.channel_names.items():
-                    yield Button(name, id=button_id)
-            else:
-                yield Static("No se encontraron canales en el archivo.")
+            yield Static("Cargando canales...", id="iptv-loading")
+
+        with Horizontal(id="iptv-pager"):
+            yield Button("◀ Anterior", id="iptv_prev_page", disabled=True)
+            yield Static("", id="iptv-page-label")
+            yield Button("Siguiente ▶", id="iptv_next_page", disabled=True)
         
         yield Footer()
         yield Button("Volver al Menú", id="exit_iptv_button", variant="error")
 
+    def on_mount(self) -> None:
+        """Empieza a cargar los canales en segundo plano."""
+        self.run_worker(self._load_channels_worker, thread=True, name="iptv_channel_loader")
+
+    def on_unmount(self) -> None:
+        # LazyM3uReader mantiene el archivo mapeado en memoria
+        close = getattr(self.table, "close", None)
+        if close is not None:
+            close()
+
+    def _load_channels_worker(self):
+        """Worker que resuelve el origen de los canales y muestra la primera página."""
+        worker = get_current_worker()
+        source = self.channels() if callable(self.channels) else self.channels
+
+        if isinstance(source, Sequence):
+            # Hasta que la pantalla se queda con el origen, cerrarlo es cosa del worker
+            handed = False
+            try:
+                # LazyM3uReader construye aquí su índice de offsets
+                len(source)
+                if worker.is_cancelled:
+                    return
+                handed = self.app.call_from_thread(self._finish_loading, source)
+            finally:
+                if not handed:
+                    close = getattr(source, "close", None)
+                    if close is not None:
+                        close()
+            return
+
+        # Lista en streaming: la primera página se muestra en cuanto llega
+        table = ChannelTable()
+        try:
+            for channel in source:
+                # Si el usuario sale de la pantalla dejamos de leer el archivo
+                if worker.is_cancelled:
+                    return
+                table.append(channel)
+                if len(table) == self.PAGE_SIZE:
+                    self.app.call_from_thread(self._show_first_page, table[:self.PAGE_SIZE])
+        finally:
+            close = getattr(source, "close", None)
+            if close is not None:
+                close()
+        self.app.call_from_thread(self._finish_loading, table)
+
+    async def _show_first_page(self, channels: List) -> None:
+        self.table = channels
+        await self._show_page(0)
+
+    async def _finish_loading(self, table: Sequence) -> bool:
+        """
+        Usa la tabla completa y muestra la página actual (o el aviso de lista vacía).
+        Devuelve False si la pantalla ya se ha cerrado y no se ha quedado con la tabla.
+        """
+        if not self.is_attached:
+            return False
+        first_page_shown = len(self.table) > 0
+        self.table = table
+        self._loading = False
+        if first_page_shown:
+            self._update_pager()
+        else:
+            await self._show_page(self.page)
+        return True
+
+    def _page_count(self) -> int:
+        return max(1, -(-len(self.table) // self.PAGE_SIZE))
+
+    async def _show_page(self, page: int) -> None:
+        """Sustituye los botones por los de una página."""
+        self.page = max(0, min(page, self._page_count() - 1))
+        start = self.page * self.PAGE_SIZE
+        channels = self.table[start:start + self.PAGE_SIZE]
+
+        channel_list = self.query_one("#iptv-channel-list", VerticalScroll)
+        await channel_list.remove_children()
+        self.channel_map = {}
+        buttons = []
+        for index, channel in enumerate(channels, start):
+            button_id = f"channel_{index}"
+            self.channel_map[button_id] = index
+            buttons.append(Button(channel.name, id=button_id))
+
+        if buttons:
+            await channel_list.mount(*buttons)
+        elif not self._loading:
+            await channel_list.mount(Static(self.empty_message, id="iptv-loading"))
+        channel_list.scroll_home(animate=False)
+        self._update_pager()
+
+    def _update_pager(self) -> None:
+        pages = self._page_count()
+        status = " (cargando...)" if self._loading else ""
+        self.query_one("#iptv-page-label", Static).update(
+            f"Página {self.page + 1} de {pages} · {len(self.table)} canales{status}"
+        )
+        self.query_one("#iptv_prev_page", Button).disabled = self.page == 0
+        self.query_one("#iptv_next_page", Button).disabled = self.page >= pages - 1
+
     def play_iptv_channel(self, radio_url: Optional[str] = None) -> None:
         """Inicia la reproducción del canal IPTV."""
         if not self.selected_channel_url or not self.selected_channel_name:
@@ -96,10 +220,18 @@ class IptvListScreen(Screen):
             self.run_worker(self.do_disconnect, thread=True)
             return
 
+        if event.button.id == "iptv_prev_page":
+            await self._show_page(self.page - 1)
+            return
+        if event.button.id == "iptv_next_page":
+            await self._show_page(self.page + 1)
+            return
+
         # Verificar si es un botón de canal
         if event.button.id in self.channel_map:
-            self.selected_channel_url = self.channel_map[event.button.id]
-            self.selected_channel_name = self.channel_names[event.button.id]
+            channel = self.table[self.channel_map[event.button.id]]
+            self.selected_channel_url = channel.url
+            self.selected_channel_name = channel.name
 
             # Si la radio ya está activa, reproducir directamente
             if self.app.is_radio_playing():
@@ -1,40 +1,49 @@
 # app/ui/screens/m3u_list_screen.py
 
 import os
-from typing import List
+from typing import Callable, List, Optional
 from textual import log
 from textual.app import ComposeResult
 from textual.containers import VerticalScroll
 from textual.screen import Screen
-from textual.widgets import Button, Footer, Header, Static
+from textual.widgets import Button, Footer, Header, Input, Static
 from textual.worker import Worker, WorkerState
 
 # --- REFACTORIZACIÓN: Importamos el nuevo config ---
 from app.core.config import config
-from app.core.iptv import parse_m3u_file
+from app.core.iptv import m3u_display_name, open_channel_list, parse_all_m3u_files
+from app.core.iptv_search import search_channels
 from app.core.vpn import VPNStatus, connect_vpn
 from app.ui.screens.iptv_list_screen import IptvListScreen
 
 class M3uListScreen(Screen):
     """Una pantalla para mostrar la lista de archivos M3U disponibles."""
 
+    # Resultados que se muestran al buscar un canal
+    SEARCH_LIMIT = 200
+
     def __init__(self, m3u_files: List[str], **kwargs):
         super().__init__(**kwargs)
         self.m3u_files = m3u_files
         self.file_map: dict[str, str] = {}
+        # Pantalla que se abrirá cuando termine de conectarse la VPN
+        self._pending_open: Optional[Callable[[], None]] = None
 
     def compose(self) -> ComposeResult:
         yield Header(show_clock=True, name="Seleccionar Lista M3U")
+        if self.m3u_files:
+            yield Input(placeholder="Buscar canal en todas las listas...", id="m3u-search")
         with VerticalScroll(id="m3u-file-list"):
             if self.m3u_files:
+                yield Button("Todos los canales", id="m3u_all_channels", variant="primary")
                 for i, file_name in enumerate(self.m3u_files):
-                    display_name = os.path.splitext(file_name)[0]
+                    display_name = m3u_display_name(file_name)
                     button_id = f"m3u_button_{i}"
                     button = Button(display_name, id=button_id)
                     self.file_map[button_id] = file_name
                     yield button
             else:
-                yield Static("No se encontraron archivos .m3u en la carpeta configurada.")
+                yield Static("No se encontraron listas M3U en la carpeta configurada.")
         
         yield Footer()
         yield Button("Volver", id="exit_m3u_list_button", variant="error")
@@ -47,13 +56,48 @@ class M3uListScreen(Screen):
             return
             
         full_path = os.path.join(iptv_folder, file_name)
-        channels = parse_m3u_file(full_path)
-        
-        if not channels:
-            self.app.notify(f"El archivo '{file_name}' está vacío o no es válido.", severity="error")
+        if not os.path.isfile(full_path):
+            self.app.notify(f"El archivo '{file_name}' no existe.", severity="error")
             return
             
-        self.app.push_screen(IptvListScreen(channels=channels))
+        # La lista se abre en el worker de la pantalla y se muestra por páginas
+        self.app.push_screen(IptvListScreen(channels=lambda: open_channel_list(full_path)))
+
+    def _open_all_channels(self):
+        """
+        Abre todas las listas juntas: se parsean en paralelo en el worker de la
+        pantalla y cada stream se muestra una sola vez aunque esté en varias.
+        """
+        iptv_folder = config.get("PATHS", "iptv_folder_path")
+        self.app.push_screen(IptvListScreen(channels=lambda: parse_all_m3u_files(iptv_folder, dedupe=True)[0]))
+
+    def _open_search(self, query: str):
+        """Abre los resultados de búsqueda (el índice se actualiza en el worker de la pantalla)."""
+        self.app.push_screen(IptvListScreen(
+            channels=lambda: [hit.channel for hit in search_channels(query, limit=self.SEARCH_LIMIT)],
+            empty_message=f"Ningún canal coincide con '{query}'."
+        ))
+
+    def on_input_submitted(self, event: Input.Submitted) -> None:
+        query = event.value.strip()
+        if event.input.id == "m3u-search" and query:
+            self._open_with_vpn(lambda: self._open_search(query), "search")
+
+    def _open_with_vpn(self, open_screen: Callable[[], None], worker_name: str) -> None:
+        """Abre una lista de canales, conectando antes la VPN si está configurada."""
+        use_vpn = config.get_boolean("VPN", "enabled_for_iptv", fallback=False)
+
+        if not use_vpn:
+            open_screen()
+            return
+
+        self._pending_open = open_screen
+        self.app.notify("Conectando a la VPN...")
+        self.run_worker(
+            connect_vpn,
+            thread=True,
+            name=f"vpn_connector_{worker_name}"
+        )
 
     def on_button_pressed(self, event: Button.Pressed) -> None:
         """Llamado cuando se presiona un botón."""
@@ -62,22 +106,14 @@ class M3uListScreen(Screen):
             self.app.pop_screen()
             return
 
+        if event.button.id == "m3u_all_channels":
+            self._open_with_vpn(self._open_all_channels, "all")
+            return
+
         button_id = event.button.id
         if button_id in self.file_map:
             file_name = self.file_map[button_id]
-            
-            use_vpn = config.get_boolean("VPN", "enabled_for_iptv", fallback=False)
-
-            if not use_vpn:
-                self._open_channel_list(file_name)
-                return
-
-            self.app.notify("Conectando a la VPN...")
-            self.run_worker(
-                lambda: (connect_vpn(), file_name),
-                thread=True,
-                name=f"vpn_connector_{button_id}" 
-            )
+            self._open_with_vpn(lambda: self._open_channel_list(file_name), button_id)
 
     def on_worker_state_changed(self, event) -> None:
         """Escucha cuando un worker ha terminado."""
@@ -88,15 +124,16 @@ class M3uListScreen(Screen):
                 log.error(f"El worker {event.worker.name} ha fallado.")
                 self.app.notify("Error al conectar a la VPN.", severity="error")
 
-    def on_vpn_connection_finished(self, result: tuple[VPNStatus, str]) -> None:
+    def on_vpn_connection_finished(self, vpn_status: VPNStatus) -> None:
         """Se llama cuando la conexión VPN ha terminado."""
-        vpn_status, file_name = result
         if vpn_status == VPNStatus.SUCCESS:
             self.app.notify("VPN conectada. Abriendo canales...")
         else:
             self.app.notify("Error al conectar a la VPN. Abriendo canales de todas formas...", severity="error")
         
-        self._open_channel_list(file_name)
+        open_screen, self._pending_open = self._pending_open, None
+        if open_screen is not None:
+            open_screen()
 
     def action_toggle_dark(self) -> None:
         """An action to toggle dark mode."""
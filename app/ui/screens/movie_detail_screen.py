@@ -10,6 +10,7 @@ from textual.widgets import Button, Header, Footer, Static
 from textual.containers import Vertical, Horizontal, ScrollableContainer
 
 from app.core.progress import get_progress, clear_progress
+from app.core.thumbnails import Thumbnail, get_thumbnail_pipeline, render_half_blocks
 from app.ui.screens.now_playing_screen import NowPlayingScreen
 
 class MovieDetailScreen(Screen):
@@ -27,6 +28,12 @@ class MovieDetailScreen(Screen):
         margin-bottom: 1;
     }
     
+    #movie-thumbnail {
+        width: 100%;
+        height: auto;
+        content-align: center middle;
+    }
+    
     .movie-title {
         text-style: bold;
         color: $accent;
@@ -85,6 +92,7 @@ class MovieDetailScreen(Screen):
                 # Title
                 title = self.movie_info.get('title', Path(self.file_path).stem)
                 yield Static(title, classes="movie-title")
+                yield Static("", id="movie-thumbnail")
                 
                 # Basic information
                 info_parts = []
@@ -148,6 +156,23 @@ class MovieDetailScreen(Screen):
             
             yield Button("⬅️ Back", id="back_button", variant="error")
 
+    def on_mount(self) -> None:
+        """Shows the cached thumbnail, or asks the background pipeline for it."""
+        pipeline = get_thumbnail_pipeline()
+        thumb = pipeline.cache.get(self.file_path)
+        if thumb is not None:
+            self._show_thumbnail(self.file_path, thumb)
+        else:
+            pipeline.want([self.file_path], self._on_thumbnail_ready)
+
+    def _on_thumbnail_ready(self, path: str, thumb: Optional[Thumbnail]) -> None:
+        """Called from the thumbnail thread."""
+        if thumb is not None and self.is_mounted:
+            self.app.call_from_thread(self._show_thumbnail, path, thumb)
+
+    def _show_thumbnail(self, path: str, thumb: Thumbnail) -> None:
+        self.query_one("#movie-thumbnail", Static).update(render_half_blocks(thumb))
+
     def _format_time(self, seconds: float) -> str:
         """Formats seconds to HH:MM:SS."""
         secs = int(seconds)
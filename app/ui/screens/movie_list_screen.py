@@ -1,16 +1,22 @@
 # app/ui/screens/movie_list_screen.py
 
 import logging
-import os
+import sqlite3
+from functools import partial
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Iterable, List, Dict, Optional
 
 from textual.app import ComposeResult
 from textual.screen import Screen
 from textual.widgets import Button, Header, Footer, Static
-from textual.containers import VerticalScroll
+from textual.containers import Horizontal, VerticalScroll
+from textual import events
+from textual.worker import get_current_worker
 
-from app.core.progress import get_progress, clear_progress
+from app.core.media_probe import MediaInfo, probe_files
+from app.core.media_watcher import MediaWatcher
+from app.core.progress import get_progress, get_progress_many, clear_progress
+from app.core.thumbnails import Thumbnail, get_thumbnail_pipeline, render_half_blocks
 from app.ui.screens.confirm_screen import ConfirmScreen
 from app.ui.screens.now_playing_screen import NowPlayingScreen
 
@@ -18,8 +24,20 @@ class MovieListScreen(Screen):
     """Pantalla optimizada para mostrar películas locales."""
 
     CSS = """
+    #movie-body {
+        height: 1fr;
+    }
+
     #movie-list {
         height: 1fr;
+        width: 1fr;
+    }
+
+    #movie-thumbnail {
+        width: 34;
+        height: 20;
+        padding: 1;
+        content-align: center middle;
     }
     
     #movie-list Button {
@@ -32,46 +50,256 @@ class MovieListScreen(Screen):
     }
     """
 
-    def __init__(self, movies: List[str], **kwargs):
+    # Número de películas que se añaden a la lista en cada actualización de la UI
+    BATCH_SIZE = 100
+    # Miniaturas que se piden alrededor de la película seleccionada
+    THUMBNAIL_AHEAD = 10
+
+    def __init__(self, movies: Iterable[str], watch_path: Optional[str] = None, **kwargs):
         super().__init__(**kwargs)
-        # Optimización: precalcular nombres y verificar existencia
+        # Las películas pueden venir de un escaneo en curso: se van montando por lotes
+        self.movies = movies
         self.file_map: Dict[str, str] = {}
         self.file_progress: Dict[str, Optional[float]] = {}
-        
-        for i, path in enumerate(movies):
-            if os.path.exists(path):
-                file_id = f"movie_{i}"
-                self.file_map[file_id] = path
-                # Precalcular progreso para indicadores visuales
-                self.file_progress[file_id] = get_progress(path)
+        # Duración, códecs... de cada película, según se van analizando
+        self.file_info: Dict[str, MediaInfo] = {}
+        self.path_ids: Dict[str, str] = {}
+        # Botón de cada película, para no buscarlo en el DOM cada vez
+        self.buttons: Dict[str, Button] = {}
+        # Películas en el orden de la lista y posición de cada una
+        self.order: List[str] = []
+        self.positions: Dict[str, int] = {}
+        self._next_id = 0
+        # Si se indica una carpeta, la lista se actualiza sola al añadir o borrar vídeos
+        self.watch_path = watch_path
+        self._watcher: Optional[MediaWatcher] = None
+        # Película cuya miniatura se está mostrando
+        self._preview_path: Optional[str] = None
 
     def compose(self) -> ComposeResult:
         yield Header(show_clock=True, name="Películas Locales")
         
-        with VerticalScroll(id="movie-list"):
-            if self.file_map:
-                for file_id, path in self.file_map.items():
-                    file_name = Path(path).name
-                    progress = self.file_progress.get(file_id)
-                    
-                    # Indicador visual si tiene progreso
-                    label = file_name
-                    if progress and progress > 10:
-                        time_str = self._format_time(progress)
-                        label = f"{file_name} [{time_str}]"
-                    
-                    button = Button(
-                        label,
-                        id=file_id,
-                        classes="has-progress" if progress else ""
-                    )
-                    yield button
-            else:
-                yield Static("No se encontraron películas.")
+        with Horizontal(id="movie-body"):
+            with VerticalScroll(id="movie-list"):
+                yield Static("Buscando películas...", id="movie-loading")
+            yield Static("", id="movie-thumbnail")
         
         yield Footer()
         yield Button("Volver", id="exit_movie_button", variant="error")
 
+    def on_mount(self) -> None:
+        """Empieza a buscar las películas en segundo plano."""
+        self.run_worker(self._load_movies_worker, thread=True, name="movie_loader")
+
+    def _load_movies_worker(self):
+        """Worker que consume el escaneo y envía las películas a la UI por lotes."""
+        worker = get_current_worker()
+        batch = []
+        try:
+            for path in self.movies:
+                # Si el usuario sale de la pantalla se detiene el escaneo
+                if worker.is_cancelled:
+                    return
+                batch.append(path)
+                if len(batch) >= self.BATCH_SIZE:
+                    self.app.call_from_thread(self._append_movies, batch)
+                    batch = []
+        except sqlite3.Error as e:
+            # Se muestra lo que se haya podido leer
+            logging.error(f"Error al leer la biblioteca de películas: {e}")
+            self.app.call_from_thread(
+                self.app.notify, "No se pudo leer la biblioteca de películas.", severity="error"
+            )
+        finally:
+            close = getattr(self.movies, "close", None)
+            if close is not None:
+                close()
+        self.app.call_from_thread(self._finish_loading, batch)
+
+    def _append_movies(self, batch: List[str]) -> None:
+        """Añade un lote de películas a la lista (el progreso se rellena después)."""
+        buttons = []
+        for path in batch:
+            file_id = f"movie_{self._next_id}"
+            self._next_id += 1
+            self.file_map[file_id] = path
+            self.path_ids[path] = file_id
+            button = self.buttons[file_id] = Button(self._movie_label(file_id), id=file_id)
+            buttons.append(button)
+            self.positions[file_id] = len(self.order)
+            self.order.append(file_id)
+        if buttons:
+            self.query_one("#movie-list", VerticalScroll).mount(*buttons)
+
+    def _finish_loading(self, batch: List[str]) -> None:
+        """Añade el último lote y retira el indicador de búsqueda."""
+        self._append_movies(batch)
+        loading = self.query_one("#movie-loading", Static)
+
+        if self.file_map:
+            loading.remove()
+        else:
+            loading.update("No se encontraron películas.")
+
+        # Primero las marcas de progreso (rápido) y después duraciones y códecs
+        # (de la caché al momento, con ffprobe lo que falte)
+        paths = list(self.file_map.values())
+        self.run_worker(partial(self._progress_worker, paths), thread=True, name="movie_progress")
+
+        if self.watch_path and self._watcher is None:
+            self._watcher = MediaWatcher(self.watch_path, self.file_map.values(), self._on_library_changed)
+            self._watcher.start()
+
+    def _movie_label(self, file_id: str) -> str:
+        """Nombre con la posición guardada, la duración y el porcentaje visto."""
+        file_name = Path(self.file_map[file_id]).name
+        progress = self.file_progress.get(file_id)
+        info = self.file_info.get(file_id)
+        duration = info.duration if info else 0
+
+        # Indicador visual si tiene progreso
+        if progress and progress > 10:
+            time_str = self._format_time(progress)
+            if duration:
+                percent = min(100, int(progress * 100 / duration))
+                return f"{file_name} [{time_str} / {self._format_time(duration)} · {percent}%]"
+            return f"{file_name} [{time_str}]"
+        if duration:
+            return f"{file_name} [{self._format_time(duration)}]"
+        return file_name
+
+    def _progress_worker(self, paths: List[str]):
+        """Worker que lee el progreso de todas las películas de una vez."""
+        progress = get_progress_many(paths)
+        if not get_current_worker().is_cancelled:
+            self.app.call_from_thread(self._show_progress, progress)
+            self.app.call_from_thread(
+                self.run_worker, partial(self._probe_worker, paths), thread=True, name="movie_prober"
+            )
+
+    def _show_progress(self, progress: Dict[str, Optional[float]]) -> None:
+        """Guarda el progreso leído y marca las películas empezadas."""
+        marked = []
+        for path, position in progress.items():
+            file_id = self.path_ids.get(path)
+            if file_id is None:
+                continue
+            self.file_progress[file_id] = position
+            # Sin posición guardada la etiqueta no cambia
+            if position is None:
+                continue
+            button = self.buttons[file_id]
+            button.label = self._movie_label(file_id)
+            # Los estilos se recalculan después, todos los botones a la vez
+            button.set_class(bool(position), "has-progress", update=False)
+            marked.append(button)
+        if marked:
+            self.app.stylesheet.update_nodes(marked)
+
+    def _probe_worker(self, paths: List[str]):
+        """Worker que analiza las películas y actualiza sus etiquetas por lotes."""
+        worker = get_current_worker()
+        probes = probe_files(paths)
+        batch = []
+        try:
+            for item in probes:
+                if worker.is_cancelled:
+                    return
+                batch.append(item)
+                if len(batch) >= self.BATCH_SIZE:
+                    self.app.call_from_thread(self._show_media_info, batch)
+                    batch = []
+        except sqlite3.Error as e:
+            # Sin duraciones ni códecs la lista sigue funcionando
+            logging.error(f"Error al guardar los datos de las películas: {e}")
+        finally:
+            probes.close()
+        if batch:
+            self.app.call_from_thread(self._show_media_info, batch)
+
+    def _show_media_info(self, batch: List[tuple]) -> None:
+        """Guarda los datos analizados y actualiza las etiquetas."""
+        for path, info in batch:
+            file_id = self.path_ids.get(path)
+            if file_id is None:
+                continue
+            self.file_info[file_id] = info
+            self.buttons[file_id].label = self._movie_label(file_id)
+
+    def on_descendant_focus(self, event: events.DescendantFocus) -> None:
+        """Muestra la miniatura de la película seleccionada y prepara las cercanas."""
+        file_id = event.widget.id
+        path = self.file_map.get(file_id) if file_id else None
+        if path is None:
+            return
+        self._preview_path = path
+
+        # Solo la caché en memoria: la del disco la consulta el hilo de miniaturas
+        pipeline = get_thumbnail_pipeline()
+        thumb = pipeline.cache.peek(path)
+        preview = self.query_one("#movie-thumbnail", Static)
+        preview.update(render_half_blocks(thumb) if thumb else "Generando miniatura...")
+
+        # Orden de generación: la seleccionada y después las más cercanas, alternando
+        index = self.positions[file_id]
+        nearby = []
+        for distance in range(self.THUMBNAIL_AHEAD + 1):
+            for i in {index + distance, index - distance}:
+                if 0 <= i < len(self.order):
+                    nearby.append(self.file_map[self.order[i]])
+        pipeline.want(nearby, self._on_thumbnail_ready)
+
+    def _on_thumbnail_ready(self, path: str, thumb: Optional[Thumbnail]) -> None:
+        """Llamado desde el hilo de miniaturas."""
+        if path == self._preview_path:
+            self.app.call_from_thread(self._show_thumbnail, path, thumb)
+
+    def _show_thumbnail(self, path: str, thumb: Optional[Thumbnail]) -> None:
+        if path != self._preview_path:
+            return
+        preview = self.query_one("#movie-thumbnail", Static)
+        preview.update(render_half_blocks(thumb) if thumb else "Sin miniatura")
+
+    def on_unmount(self) -> None:
+        # Las miniaturas pendientes de esta pantalla ya no hacen falta
+        get_thumbnail_pipeline().want([], self._on_thumbnail_ready)
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+
+    def _on_library_changed(self, added: List[str], removed: List[str]) -> None:
+        """Llamado desde el hilo del vigilante con los cambios ya agrupados."""
+        progress = get_progress_many(added)
+        self.app.call_from_thread(self._apply_library_changes, added, removed, progress)
+
+    def _apply_library_changes(self, added: List[str], removed: List[str],
+                               progress: Dict[str, Optional[float]]) -> None:
+        """Añade y quita botones según los vídeos añadidos o borrados del disco."""
+        for path in removed:
+            file_id = self.path_ids.pop(path, None)
+            if file_id is None:
+                continue
+            del self.file_map[file_id]
+            self.file_progress.pop(file_id, None)
+            self.file_info.pop(file_id, None)
+            self.buttons.pop(file_id).remove()
+        if removed:
+            self.order = [file_id for file_id in self.order if file_id in self.file_map]
+            self.positions = {file_id: i for i, file_id in enumerate(self.order)}
+
+        self._append_movies(added)
+        self._show_progress(progress)
+        if added:
+            # ffprobe puede tardar: los vídeos nuevos se analizan en el worker, no en el vigilante
+            self.run_worker(partial(self._probe_worker, added), thread=True, name="movie_prober")
+        loading = self.query("#movie-loading")
+        if self.file_map:
+            loading.remove()
+        elif not loading:
+            self.query_one("#movie-list", VerticalScroll).mount(
+                Static("No se encontraron películas.", id="movie-loading")
+            )
+
     def _format_time(self, seconds: float) -> str:
         """Formatea segundos a HH:MM:SS."""
         secs = int(seconds)
@@ -112,7 +340,11 @@ class MovieListScreen(Screen):
         if not file_path:
             return
 
-        progress = self.file_progress.get(event.button.id)
+        if event.button.id in self.file_progress:
+            progress = self.file_progress[event.button.id]
+        else:
+            # Pulsada antes de que el worker haya leído el progreso
+            progress = get_progress(file_path)
         
         if progress and progress > 10:
             time_str = self._format_time(progress)
@@ -3,6 +3,7 @@
 import os
 import logging
 import io
+import math
 import qrcode
 import time
 from textual.app import ComposeResult
@@ -122,12 +123,19 @@ class SettingsScreen(Screen):
                     placeholder="./Archivos M3U/"
                 )
 
-                yield Label("URL de origen para IPTV:")
+                yield Label("URL de origen para IPTV (varias separadas por espacios, por prioridad):")
                 yield Input(
                     config.get("IPTV", "source_url", fallback=""),
                     id="source_url",
                     placeholder="https://ejemplo.com/lista.m3u"
                 )
+
+                yield Label("Actualización automática de canales (horas, 0 = desactivada):")
+                yield Input(
+                    config.get("IPTV", "refresh_interval_hours", fallback="0"),
+                    id="refresh_interval_hours",
+                    placeholder="0"
+                )
                 
                 yield Label("País para la VPN (opcional):")
                 yield Input(
@@ -437,6 +445,7 @@ class SettingsScreen(Screen):
             local_path = self.query_one("#local_media_path", Input).value.strip()
             iptv_path = self.query_one("#iptv_folder_path", Input).value.strip()
             source_url = self.query_one("#source_url", Input).value.strip()
+            refresh_interval = self.query_one("#refresh_interval_hours", Input).value.strip() or "0"
             vpn_country = self.query_one("#vpn_country", Input).value.strip()
             vpn_token = self.query_one("#vpn_token", Input).value.strip()
             vpn_enabled = self.query_one("#vpn_for_iptv", Switch).value
@@ -451,10 +460,20 @@ class SettingsScreen(Screen):
                 self.app.notify("La ruta de archivos M3U no es válida.", severity="warning", timeout=5)
                 return
 
+            try:
+                interval = float(refresh_interval)
+                # float() también acepta "nan" e "inf"
+                if not math.isfinite(interval) or interval < 0:
+                    raise ValueError
+            except ValueError:
+                self.app.notify("El intervalo de actualización no es válido.", severity="warning", timeout=5)
+                return
+
             # Save configuration
             config.set("PATHS", "local_media_path", local_path)
             config.set("PATHS", "iptv_folder_path", iptv_path)
             config.set("IPTV", "source_url", source_url)
+            config.set("IPTV", "refresh_interval_hours", refresh_interval)
             config.set("VPN", "country", vpn_country)
             config.set("VPN", "access_token", vpn_token)
             config.set("VPN", "enabled_for_iptv", "yes" if vpn_enabled else "no")
@@ -469,6 +488,7 @@ class SettingsScreen(Screen):
                         except OSError as e:
                             logging.error(f"Error al crear directorio {path}: {e}")
                 
+                self.app.schedule_channel_refresh()
                 self.app.notify("Configuración guardada correctamente.")
                 self.app.pop_screen()
             else:
@@ -2,10 +2,12 @@
 # run.py - Archivo principal optimizado
 
 import logging
+import math
 import subprocess
 import os
 import socket
 import json
+import random
 import time
 from textual.app import App, ComposeResult
 from textual.widgets import Button, Header, Footer, Static
@@ -13,13 +15,16 @@ from textual.containers import Vertical
 
 # Importaciones optimizadas
 from app.core.config import config
-from app.core.iptv_refresher import refresh_channels
-from app.core.vpn import connect_vpn, disconnect_vpn, VPNStatus
-from app.core.local_media import get_local_movie_list
+from app.core.iptv_refresher import get_source_urls, refresh_channels, SourceStatus
+from app.core.vpn import connect_vpn, disconnect_vpn, get_vpn_status, VPNStatus
+from app.core.media_library import sync_library
+from app.core.media_duplicates import find_duplicates
 from app.core.iptv import get_m3u_files
 
 from app.ui.screens.movie_list_screen import MovieListScreen
+from app.ui.screens.now_playing_screen import NowPlayingScreen
 from app.ui.screens.m3u_list_screen import M3uListScreen
+from app.ui.screens.iptv_list_screen import IptvListScreen
 from app.ui.screens.settings_screen import SettingsScreen
 from app.ui.screens.radio_manager_screen import RadioManagerScreen
 
@@ -51,17 +56,31 @@ class MediaCenterApp(App):
     }
     """
 
+    # Actualización automática de canales
+    REFRESH_JITTER = 0.1                # Hasta un 10% del intervalo, para no coincidir siempre a la misma hora
+    REFRESH_RETRY_BASE = 5 * 60         # Primer reintento tras un fallo (segundos)
+    REFRESH_RETRY_MAX = 6 * 60 * 60     # Tope del backoff exponencial (segundos)
+    REFRESH_POSTPONE_PLAYING = 15 * 60  # Espera si hay algo reproduciéndose (segundos)
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.radio_process: subprocess.Popen | None = None
         self.is_radio_paused: bool = False
         self.radio_socket_path = f"/tmp/raspiptv_mpv_{os.getpid()}.sock"
+        self._refresh_timer = None
+        self._refresh_running: bool = False
+        self._refresh_failures: int = 0
+
+    def on_mount(self) -> None:
+        """Programa la actualización automática de canales."""
+        self.schedule_channel_refresh()
 
     def compose(self) -> ComposeResult:
         yield Header(show_clock=True)
         with Vertical(id="main-menu"):
             yield Static("Bienvenido al Media Center", classes="title")
             yield Button("Ver Películas (Local)", id="btn_local_media", variant="primary")
+            yield Button("Buscar Películas Duplicadas", id="btn_find_duplicates")
             yield Button("IPTV", id="btn_iptv", variant="success")
             yield Button("Actualizar Canales IPTV", id="btn_refresh_iptv", variant="warning")
             yield Button("Gestionar Radios", id="btn_manage_radio")
@@ -146,33 +165,146 @@ class MediaCenterApp(App):
         self._send_mpv_command(command)
         self.notify("Radio pausada." if self.is_radio_paused else "Radio reanudada.")
 
+    # --- Actualización automática de canales ---
+
+    def is_stream_playing(self) -> bool:
+        """Comprueba si hay un vídeo o la radio reproduciéndose."""
+        if self.is_radio_playing():
+            return True
+        return any(isinstance(screen, NowPlayingScreen) for screen in self.screen_stack)
+
+    def is_iptv_in_use(self) -> bool:
+        """Hay algo reproduciéndose o una pantalla de IPTV abierta: la VPN puede hacer falta."""
+        if self.is_stream_playing():
+            return True
+        return any(isinstance(screen, (M3uListScreen, IptvListScreen)) for screen in self.screen_stack)
+
+    def _refresh_interval(self) -> float:
+        """Intervalo de actualización automática en segundos (0 = desactivada)."""
+        try:
+            hours = float(config.get("IPTV", "refresh_interval_hours", fallback="0") or 0)
+            if not math.isfinite(hours):
+                raise ValueError
+        except ValueError:
+            logging.warning("refresh_interval_hours no es un número. Actualización automática desactivada.")
+            return 0.0
+        return max(hours, 0.0) * 3600
+
+    def schedule_channel_refresh(self, delay: float | None = None) -> None:
+        """
+        Programa la próxima actualización automática. Sin delay, se calcula a
+        partir de la última actualización correcta guardada en config.ini.
+        """
+        if self._refresh_timer is not None:
+            self._refresh_timer.stop()
+            self._refresh_timer = None
+
+        interval = self._refresh_interval()
+        if interval <= 0 or not config.get("IPTV", "source_url"):
+            return
+
+        if delay is None:
+            try:
+                last = float(config.get("IPTV", "last_refresh", fallback="0") or 0)
+            except ValueError:
+                last = 0.0
+            delay = max(0.0, last + interval - time.time())
+            delay += random.uniform(0, interval * self.REFRESH_JITTER)
+
+        logging.info(f"Próxima actualización automática de canales en {delay / 60:.0f} min.")
+        self._refresh_timer = self.set_timer(delay, self._on_refresh_timer)
+
+    def _on_refresh_timer(self) -> None:
+        """Lanza la actualización programada salvo que se esté reproduciendo algo."""
+        self._refresh_timer = None
+        if self.is_stream_playing() or self._refresh_running:
+            logging.info("Actualización automática aplazada: reproducción o actualización en curso.")
+            self.schedule_channel_refresh(self.REFRESH_POSTPONE_PLAYING)
+            return
+        self._start_channel_refresh(background=True)
+
+    def _start_channel_refresh(self, background: bool = False) -> None:
+        self._refresh_running = True
+        self.run_worker(
+            lambda: self._run_channel_refresh(background),
+            thread=True,
+            exclusive=True,
+            group="channel_refresh"
+        )
+
+    def _on_refresh_finished(self, success: bool) -> None:
+        """Guarda la hora del último éxito y programa la siguiente ejecución."""
+        self._refresh_running = False
+        if success:
+            self._refresh_failures = 0
+            config.set("IPTV", "last_refresh", str(int(time.time())))
+            config.save()
+            self.schedule_channel_refresh()
+        else:
+            self._refresh_failures += 1
+            delay = min(
+                self.REFRESH_RETRY_BASE * 2 ** (self._refresh_failures - 1),
+                self.REFRESH_RETRY_MAX
+            )
+            logging.warning(f"Actualización fallida ({self._refresh_failures} seguidas). Reintento en {delay / 60:.0f} min.")
+            self.schedule_channel_refresh(delay)
+
     # --- Worker para actualizar canales ---
     
-    def _run_channel_refresh(self):
-        """Worker que actualiza los canales IPTV."""
-        self.call_from_thread(self.notify, "Conectando a la VPN...")
+    def _run_channel_refresh(self, background: bool = False):
+        """
+        Worker que actualiza los canales IPTV. En segundo plano solo se
+        notifica el resultado final.
+        """
+        def progress(message: str, **kwargs):
+            if not background:
+                self.call_from_thread(self.notify, message, **kwargs)
+
+        success = False
+        # Si la VPN ya estaba conectada (p. ej. viendo IPTV), no se desconecta al terminar
+        vpn_was_connected = get_vpn_status()["connected"]
+
+        progress("Conectando a la VPN...")
         vpn_status = connect_vpn()
 
         if vpn_status == VPNStatus.FAILED:
             self.call_from_thread(self.notify, "Error al conectar VPN. Abortando.", severity="error")
+            self.call_from_thread(self._on_refresh_finished, False)
             return
         elif vpn_status == VPNStatus.SKIPPED:
-            self.call_from_thread(self.notify, "Conexión VPN omitida.", severity="warning")
+            progress("Conexión VPN omitida.", severity="warning")
         else:
-            self.call_from_thread(self.notify, "VPN conectada.")
+            progress("VPN conectada.")
 
-        self.call_from_thread(self.notify, "Descargando canales...")
+        progress("Descargando canales...")
         
-        source_url = config.get("IPTV", "source_url")
+        source_urls = get_source_urls()
         output_dir = config.get("PATHS", "iptv_folder_path")
 
         try:
-            num_groups, num_channels = refresh_channels(source_url, output_dir)
-            self.call_from_thread(
-                self.notify,
-                f"✅ ¡Completado! {num_channels} canales en {num_groups} grupos.",
-                timeout=10
-            )
+            result = refresh_channels(source_urls, output_dir)
+            success = True
+            if result.unchanged:
+                message = f"✅ Sin cambios: {result.num_channels} canales en {result.num_groups} grupos."
+            else:
+                message = f"✅ ¡Completado! {result.num_channels} canales en {result.num_groups} grupos."
+                if result.diff:
+                    added = sum(d.added for d in result.diff.values())
+                    removed = sum(d.removed for d in result.diff.values())
+                    changed = sum(d.changed for d in result.diff.values())
+                    message += (
+                        f" {len(result.diff)} grupos con cambios"
+                        f" (+{added} / -{removed} / ~{changed} canales)."
+                    )
+                if result.duplicates:
+                    message += f" {result.duplicates} duplicados eliminados."
+            if result.sources:
+                failed = sum(1 for s in result.sources if s.status == SourceStatus.FAILED)
+                message += f" {len(result.sources)} fuentes"
+                message += f", {failed} con errores." if failed else "."
+            # En segundo plano no se molesta si no ha cambiado nada
+            if not (background and result.unchanged):
+                self.call_from_thread(self.notify, message, timeout=10)
         except Exception as e:
             logging.error(f"Error en actualización: {e}")
             self.call_from_thread(
@@ -182,10 +314,46 @@ class MediaCenterApp(App):
                 timeout=15
             )
         finally:
-            if vpn_status == VPNStatus.SUCCESS:
-                self.call_from_thread(self.notify, "Desconectando VPN...")
-                disconnect_vpn()
-                self.call_from_thread(self.notify, "VPN desconectada.")
+            if vpn_status == VPNStatus.SUCCESS and not vpn_was_connected:
+                # En segundo plano el usuario puede haber empezado a ver IPTV mientras tanto
+                if background and self.call_from_thread(self.is_iptv_in_use):
+                    logging.info("La VPN se está usando para IPTV: no se desconecta tras la actualización.")
+                else:
+                    progress("Desconectando VPN...")
+                    disconnect_vpn()
+                    progress("VPN desconectada.")
+            self.call_from_thread(self._on_refresh_finished, success)
+
+    # --- Worker para buscar duplicados ---
+
+    def _run_find_duplicates(self, media_path: str):
+        """Worker que busca vídeos repetidos y resume el espacio recuperable."""
+        self.call_from_thread(self.notify, "Buscando películas duplicadas...")
+        try:
+            report = find_duplicates([media_path])
+        except Exception as e:
+            logging.error(f"Error al buscar duplicados: {e}")
+            self.call_from_thread(self.notify, f"❌ Error: {e}", severity="error", timeout=15)
+            return
+
+        if not report.groups:
+            self.call_from_thread(self.notify, "No hay películas duplicadas.")
+            return
+
+        for group in report.groups:
+            logging.info(f"Duplicados ({group.size / 1024**3:.2f} GiB): {', '.join(group.paths)}")
+        lines = [
+            f"{len(group.paths)}× {os.path.basename(group.paths[0])}"
+            for group in report.groups[:5]
+        ]
+        if len(report.groups) > 5:
+            lines.append(f"... y {len(report.groups) - 5} más (ver app.log)")
+        self.call_from_thread(
+            self.notify,
+            f"{len(report.groups)} películas duplicadas, "
+            f"{report.reclaimable / 1024**3:.1f} GiB recuperables:\n" + "\n".join(lines),
+            timeout=20
+        )
 
     # --- Botones del menú ---
     
@@ -194,8 +362,21 @@ class MediaCenterApp(App):
         if event.button.id == "btn_local_media":
             media_path = config.get('PATHS', 'local_media_path')
             if media_path and os.path.isdir(media_path):
-                movies = get_local_movie_list(media_path)
-                self.push_screen(MovieListScreen(movies=movies))
+                # La biblioteca se sincroniza en un hilo de la pantalla: solo se releen
+                # las carpetas que han cambiado y la UI no se bloquea
+                self.push_screen(MovieListScreen(movies=sync_library(media_path), watch_path=media_path))
+            else:
+                self.notify("Ruta local no configurada o no válida.", severity="error")
+
+        elif event.button.id == "btn_find_duplicates":
+            media_path = config.get('PATHS', 'local_media_path')
+            if media_path and os.path.isdir(media_path):
+                self.run_worker(
+                    lambda: self._run_find_duplicates(media_path),
+                    thread=True,
+                    exclusive=True,
+                    group="find_duplicates"
+                )
             else:
                 self.notify("Ruta local no configurada o no válida.", severity="error")
 
@@ -219,7 +400,11 @@ class MediaCenterApp(App):
                 )
                 return
             
-            self.run_worker(self._run_channel_refresh, thread=True, exclusive=True)
+            if self._refresh_running:
+                self.notify("Ya hay una actualización de canales en curso.", severity="warning")
+                return
+
+            self._start_channel_refresh()
 
         elif event.button.id == "btn_settings":
             self.push_screen(SettingsScreen())